@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+class CachedAnswer:
+    """An answer stored in the semantic cache"""
+
+    def __init__(self, scope, vector, answer, sources):
+        self.scope = scope
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+        self.created = time.monotonic()
+
+class SemanticAnswerCache:
+    """Serves stored answers for questions that are semantically close to earlier ones.
+
+    Entries are grouped by scope (index, namespace, mode) and matched by
+    cosine similarity of the question embeddings. Expired entries are
+    dropped on lookup and the least recently used entry is evicted once
+    the cache is full.
+    """
+
+    def __init__(self, threshold=0.95, ttl_seconds=3600, max_entries=1000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._next_id = 0
+        # Per-scope entry IDs and stacked unit vectors, rebuilt lazily
+        self._scope_ids = {}
+        self._scope_matrix = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def scope(index_name, namespaces, mode):
+        """Build the cache scope for a question over one or more namespaces"""
+        if isinstance(namespaces, str):
+            namespaces = [namespaces]
+        return (index_name or "", ",".join(sorted(namespaces or [])), mode)
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        self._scope_ids[entry.scope].remove(entry_id)
+        self._scope_matrix.pop(entry.scope, None)
+
+    def _matrix(self, scope):
+        if scope not in self._scope_matrix:
+            ids = self._scope_ids.get(scope, [])
+            self._scope_matrix[scope] = (
+                np.stack([self._entries[entry_id].vector for entry_id in ids]) if ids else None
+            )
+        return self._scope_matrix[scope]
+
+    def lookup(self, scope, vector):
+        """Return the closest CachedAnswer within the threshold, or None"""
+        query = self._normalize(vector)
+        with self._lock:
+            now = time.monotonic()
+            expired = [
+                entry_id for entry_id in self._scope_ids.get(scope, [])
+                if now - self._entries[entry_id].created > self.ttl_seconds
+            ]
+            for entry_id in expired:
+                self._remove(entry_id)
+
+            matrix = self._matrix(scope)
+            if matrix is None:
+                return None
+
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            entry_id = self._scope_ids[scope][best]
+            self._entries.move_to_end(entry_id)
+            return self._entries[entry_id]
+
+    def store(self, scope, vector, answer, sources):
+        """Add an answer to the cache, evicting the least recently used entry if full"""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = CachedAnswer(scope, self._normalize(vector), answer, sources)
+            self._scope_ids.setdefault(scope, []).append(entry_id)
+            self._scope_matrix.pop(scope, None)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, index_name, namespace=None):
+        """Drop every answer derived from an index, or from one namespace of it"""
+        with self._lock:
+            for scope in list(self._scope_ids):
+                scope_index, scope_namespaces, _ = scope
+                if scope_index != index_name:
+                    continue
+                if namespace is not None and namespace not in scope_namespaces.split(","):
+                    continue
+                for entry_id in list(self._scope_ids[scope]):
+                    self._remove(entry_id)
+
+    def __len__(self):
+        return len(self._entries)
\ No newline at end of file
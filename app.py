@@ -1,8 +1,13 @@
+import uuid
+
 import streamlit as st
-from document_processor import DocumentProcessor
 from chat_engine import ChatEngine
+from chat_history import ChatHistory
 from ui_components import UIComponents
 from config import Config
+from conversation import ConversationMemory
+from tracing import Trace
+import resources
 
 def main():
     # Setup page config and custom CSS
@@ -21,34 +26,71 @@ def main():
     if 'llm' not in st.session_state:
         st.session_state.llm = None
     if 'messages' not in st.session_state:
-        st.session_state.messages = []
+        st.session_state.messages = ChatHistory(Config.CHAT_HISTORY_PAGE_TURNS)
     if 'processed' not in st.session_state:
         st.session_state.processed = False
-    if 'uploaded_file' not in st.session_state:
-        st.session_state.uploaded_file = None
+    if 'uploader_key' not in st.session_state:
+        st.session_state.uploader_key = 0
     if 'use_rag' not in st.session_state:
         st.session_state.use_rag = True
+    if 'index_name' not in st.session_state:
+        st.session_state.index_name = None
+    if 'selected_docs' not in st.session_state:
+        st.session_state.selected_docs = []
+    if 'session_id' not in st.session_state:
+        # Ingestion memory is limited per session
+        st.session_state.session_id = uuid.uuid4().hex
+    if 'pending_jobs' not in st.session_state:
+        st.session_state.pending_jobs = []
+    if 'memory' not in st.session_state:
+        st.session_state.memory = ConversationMemory(
+            Config.HISTORY_TOKEN_BUDGET,
+            Config.HISTORY_SUMMARY_TOKEN_BUDGET
+        )
     
-    # Initialize document processor
-    doc_processor = DocumentProcessor()
+    # Document processor and its clients are shared process-wide across reruns
+    doc_processor = resources.get_document_processor()
     chat_engine = ChatEngine()
     
+    ingestion_queue = resources.get_ingestion_queue()
+    
     def process_document_callback(uploaded_file, index_name):
         """Callback function for processing documents"""
         try:
             with st.spinner("Initializing AI Engine..."):
-                pc, embeddings, llm = doc_processor.initialize_components()
-                
-            vectorstore = doc_processor.process_pdf(uploaded_file, index_name)
-            st.session_state.vectorstore = vectorstore
-            st.session_state.llm = llm
-            st.session_state.processed = True
-            st.session_state.uploaded_file = uploaded_file
-            st.success("🎉 Document processed successfully!")
-            st.balloons()
-            st.rerun()
+                doc_processor.initialize_components()
+            
+            # Ingestion runs in the background; the session only polls its progress
+            uploaded_file.seek(0)
+            job_id = ingestion_queue.submit(
+                uploaded_file.name,
+                uploaded_file,
+                index_name,
+                session_id=st.session_state.session_id
+            )
+            st.session_state.pending_jobs = st.session_state.pending_jobs + [job_id]
+            # The upload is spooled to disk now; a fresh uploader lets Streamlit free its copy
+            st.session_state.uploader_key += 1
+            st.toast(f"📥 {uploaded_file.name} queued for processing")
         except Exception as e:
-            st.error(f"❌ Error processing PDF: {str(e)}")
+            st.error(f"❌ Error processing document: {str(e)}")
+    
+    def on_job_finished(job_id, job):
+        """Open a document for chat once its ingestion job has completed"""
+        st.session_state.pending_jobs = [
+            pending_id for pending_id in st.session_state.pending_jobs if pending_id != job_id
+        ]
+        if job is None or job["state"] != "done":
+            return
+        pc, embeddings, llm = doc_processor.initialize_components()
+        st.session_state.vectorstore = doc_processor.get_vectorstore(job["index_name"])
+        st.session_state.llm = llm
+        st.session_state.index_name = job["index_name"]
+        st.session_state.processed = True
+        if job["doc_id"] not in st.session_state.selected_docs:
+            st.session_state.selected_docs = st.session_state.selected_docs + [job["doc_id"]]
+        st.success("🎉 Document processed successfully!")
+        st.balloons()
     
     # Main Layout
     col1, col2 = st.columns([1, 2])
@@ -106,17 +148,44 @@ def main():
     
     # Sidebar
     with st.sidebar:
-        uploaded_file, index_name = UIComponents.render_sidebar(
-            st.session_state.uploaded_file,
+        index_name = UIComponents.render_sidebar(
             st.session_state.processed,
             st.session_state.use_rag,
             Config.DEFAULT_INDEX_NAME,
             process_document_callback
         )
         
-        # Update session state with uploaded file
-        if uploaded_file is not None:
-            st.session_state.uploaded_file = uploaded_file
+        # Poll background jobs without rerunning the whole page
+        @st.fragment(run_every=1.0 if ingestion_queue.active(index_name) else None)
+        def render_job_progress():
+            UIComponents.render_ingestion_jobs(ingestion_queue.list(index_name, limit=5))
+            finished = False
+            for job_id in list(st.session_state.pending_jobs):
+                job = ingestion_queue.get(job_id)
+                if job is None or job["state"] in ("done", "failed"):
+                    on_job_finished(job_id, job)
+                    finished = True
+            if finished:
+                # Refresh the whole page so the chat and document picker see the new document
+                st.rerun(scope="app")
+        
+        render_job_progress()
+        
+        # Choose which indexed documents the chat searches
+        selected_docs = UIComponents.render_document_selector(
+            doc_processor.catalog.list(index_name),
+            st.session_state.selected_docs
+        )
+        if selected_docs != st.session_state.selected_docs:
+            st.session_state.selected_docs = selected_docs
+            if selected_docs and (st.session_state.vectorstore is None or st.session_state.index_name != index_name):
+                # Previously indexed documents can be queried without re-processing
+                pc, embeddings, llm = doc_processor.initialize_components()
+                st.session_state.vectorstore = doc_processor.get_vectorstore(index_name)
+                st.session_state.llm = llm
+                st.session_state.index_name = index_name
+            st.session_state.processed = bool(selected_docs) and st.session_state.vectorstore is not None
+            st.rerun()
     
     # Main chat area
     if not st.session_state.processed:
@@ -126,58 +195,155 @@ def main():
     # Chat interface
     st.markdown("### 💬 Document Analysis Console")
     
-    # Display chat messages with modern styling
-    for message in st.session_state.messages:
-        if message["role"] == "user":
-            st.markdown(f'<div class="chat-user"><strong>You:</strong><br>{message["content"]}</div>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<div class="chat-assistant"><strong>Analyst:</strong><br>{message["content"]}</div>', unsafe_allow_html=True)
-            if "mode" in message:
-                with st.expander("🔍 Analysis Details"):
-                    st.write(f"**Mode:** {message['mode']}")
-                    if st.session_state.use_rag:
-                        st.write("**Source:** Document Content")
+    # Display chat messages with modern styling; only the latest turns are rendered
+    history = st.session_state.messages
+    if history.hidden_turns:
+        if st.button(f"⬆️ Show earlier messages ({history.hidden_turns} more turns)", use_container_width=True):
+            history.show_earlier()
+            st.rerun()
+    # One element per message, so a malformed answer cannot swallow the ones after it
+    for message in history.visible():
+        st.markdown(message.html, unsafe_allow_html=True)
+    
+    # Whole-document summaries and comparisons run map-reduce over every chunk
+    with st.expander("📑 Summaries & Comparisons"):
+        action, focus = UIComponents.render_report_actions(len(st.session_state.selected_docs))
+    if action:
+        documents = [
+            (entry["namespace"], entry["name"])
+            for entry in doc_processor.catalog.list(st.session_state.index_name)
+            if entry["doc_id"] in st.session_state.selected_docs
+        ]
+        names = [name for _, name in documents]
+        request = f"{'Compare' if action == 'compare' else 'Summarize'}: {', '.join(names)}"
+        if focus:
+            request += f" (focus: {focus})"
+        st.session_state.messages.append("user", request)
+        
+        with st.chat_message("assistant"):
+            try:
+                summarizer = resources.get_summarizer()
+                trace = Trace(
+                    action,
+                    sink=resources.get_metrics_sink(),
+                    index_name=st.session_state.index_name,
+                    documents=names
+                )
+                with st.spinner(f"📑 Reading all of {', '.join(names)}..."):
+                    if action == "compare":
+                        answer, _ = summarizer.compare(
+                            st.session_state.index_name,
+                            documents,
+                            focus=focus or None,
+                            trace=trace
+                        )
                     else:
-                        st.write("**Source:** General Knowledge")
+                        answer = "\n\n".join(
+                            f"**{name}**\n\n" + summarizer.summarize(
+                                st.session_state.index_name,
+                                namespace,
+                                name,
+                                focus=focus or None,
+                                trace=trace
+                            )
+                            for namespace, name in documents
+                        )
+                st.markdown(answer)
+                st.session_state.messages.append(
+                    "assistant",
+                    answer,
+                    mode="Comparison" if action == "compare" else "Summary",
+                    sources=names,
+                    timings=trace.finish()
+                )
+            except Exception as e:
+                error_msg = f"❌ Error analyzing documents: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append("assistant", error_msg)
     
     # Chat input
     st.markdown("---")
     if prompt := st.chat_input(f"Ask about your document... ({'Context Mode' if st.session_state.use_rag else 'AI Mode'})"):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        st.session_state.messages.append("user", prompt)
         
-        # Generate and display assistant response
+        # Generate and stream assistant response
         with st.chat_message("assistant"):
-            with st.spinner("🔍 Analyzing content..." if st.session_state.use_rag else "🤖 Thinking..."):
-                try:
-                    if st.session_state.use_rag:
-                        # Use RAG mode
-                        answer, sources = chat_engine.answer_with_rag(
+            try:
+                citations = []
+                answer_cache = resources.get_answer_cache()
+                mode = "RAG" if st.session_state.use_rag else "LLM"
+                namespaces = doc_processor.catalog.namespaces(
+                    st.session_state.index_name,
+                    st.session_state.selected_docs
+                )
+                # General-knowledge answers do not depend on the indexed documents
+                cache_scope = answer_cache.scope(
+                    st.session_state.index_name if st.session_state.use_rag else None,
+                    namespaces if st.session_state.use_rag else None,
+                    mode
+                )
+                trace = Trace(
+                    "chat",
+                    sink=resources.get_metrics_sink(),
+                    mode=mode,
+                    index_name=st.session_state.index_name
+                )
+                if st.session_state.use_rag:
+                    # Use RAG mode; sources are known as soon as retrieval finishes
+                    with st.spinner("🔍 Analyzing content..."):
+                        sources, tokens = chat_engine.stream_with_rag(
                             st.session_state.vectorstore,
                             st.session_state.llm,
-                            prompt
+                            prompt,
+                            answer_cache=answer_cache,
+                            cache_scope=cache_scope,
+                            namespaces=namespaces,
+                            index_name=st.session_state.index_name,
+                            trace=trace,
+                            memory=st.session_state.memory
                         )
-                        response = f"{answer}\n\n---\n*🔍 Answer generated using document context*"
-                    else:
-                        # Use direct LLM mode
-                        answer = chat_engine.answer_with_llm(st.session_state.llm, prompt)
-                        response = f"{answer}\n\n---\n*🤖 Answer generated using general knowledge*"
-                    
-                    st.markdown(response)
-                    
-                    mode = "RAG" if st.session_state.use_rag else "LLM"
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response,
-                        "mode": mode
-                    })
-                    
+                    citations = [ChatEngine.format_citation(doc) for doc in sources]
+                    if citations:
+                        st.caption("📚 Sources: " + " · ".join(citations))
+                    footer = "*🔍 Answer generated using document context*"
+                else:
+                    # Use direct LLM mode
+                    tokens = chat_engine.stream_with_llm(
+                        st.session_state.llm,
+                        prompt,
+                        answer_cache=answer_cache,
+                        cache_scope=cache_scope,
+                        embeddings=doc_processor.embeddings,
+                        trace=trace,
+                        memory=st.session_state.memory
+                    )
+                    footer = "*🤖 Answer generated using general knowledge*"
+                
+                answer = UIComponents.render_token_stream(tokens)
+                response = f"{answer}\n\n---\n{footer}"
+                st.session_state.messages.append(
+                    "assistant",
+                    response,
+                    mode=mode,
+                    sources=citations,
+                    timings=trace.finish()
+                )
+                
+                # Follow-up questions are resolved against this bounded history. The answer
+                # is already saved, so a failed history summary cannot take it down with it
+                memory_trace = Trace("memory", sink=resources.get_metrics_sink())
+                try:
+                    st.session_state.memory.add_turn(prompt, answer, st.session_state.llm, trace=memory_trace)
                 except Exception as e:
-                    error_msg = f"❌ Error generating response: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": error_msg
-                    })
+                    # Recorded in the metrics and skipped; the oldest turns just drop out of the history
+                    memory_trace.set(error=str(e))
+                finally:
+                    memory_trace.finish()
+                
+            except Exception as e:
+                error_msg = f"❌ Error generating response: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append("assistant", error_msg)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
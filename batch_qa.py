@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from answer_cache import SemanticAnswerCache
+from chat_engine import ChatEngine
+from config import Config
+from document_catalog import DocumentCatalog
+from index_registry import IndexRegistry
+from tracing import Trace
+import resources
+
+# Headless batch question answering over an indexed document set:
+#
+#   python batch_qa.py questions.txt -o answers.jsonl --docs annual-report
+#
+# Questions are read one per line, or from JSONL records with a "question"
+# field and an optional "id".
+
+def load_questions(path):
+    """Return (question_id, question) pairs from a text or JSONL question file"""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                questions.append((str(record.get("id", line_number)), record["question"]))
+            else:
+                questions.append((str(line_number), line))
+    return questions
+
+class BatchAnswerer:
+    """Answers a list of questions against one index with bounded concurrency.
+
+    All questions are embedded up front in batched requests. Retrieval and
+    generation then run on a pool of max_workers threads, so throughput
+    scales with the concurrency limit rather than with one question at a time.
+    """
+
+    def __init__(self, index_name, doc_ids=None, max_workers=None, use_answer_cache=False):
+        Config.validate_environment()
+        self.index_name = index_name
+        self.max_workers = max_workers or Config.BATCH_CONCURRENCY
+        self.embeddings = resources.get_embeddings()
+        self.llm = resources.get_llm()
+
+        index = IndexRegistry(resources.get_pinecone_client()).get_index(index_name)
+        self.vectorstore = resources.create_vectorstore(index, self.embeddings)
+
+        catalog = DocumentCatalog(os.path.join(Config.CACHE_DIR, "catalog.json"))
+        if doc_ids is None:
+            doc_ids = [entry["doc_id"] for entry in catalog.list(index_name)]
+        self.namespaces = catalog.namespaces(index_name, doc_ids)
+        if not self.namespaces:
+            raise ValueError(f"No indexed documents found in '{index_name}' for the selection.")
+
+        # Same scope as RAG questions asked in the app, so both share cached answers
+        self.answer_cache = resources.get_answer_cache() if use_answer_cache else None
+        self.cache_scope = SemanticAnswerCache.scope(index_name, self.namespaces, "RAG")
+
+    def _answer(self, question_id, question, question_vector):
+        trace = Trace("batch", sink=resources.get_metrics_sink(), index_name=self.index_name)
+        record = {"id": question_id, "question": question}
+        try:
+            answer, sources = ChatEngine.answer_with_rag(
+                self.vectorstore,
+                self.llm,
+                question,
+                answer_cache=self.answer_cache,
+                cache_scope=self.cache_scope,
+                namespaces=self.namespaces,
+                index_name=self.index_name,
+                question_vector=question_vector,
+                trace=trace
+            )
+            record["answer"] = answer
+            record["sources"] = [
+                {
+                    "citation": ChatEngine.format_citation(document),
+                    "doc_id": document.metadata.get("doc_id"),
+                    "score": document.metadata.get("score"),
+                }
+                for document in sources
+            ]
+        except Exception as e:
+            # One failed question should not lose the rest of the batch
+            record["error"] = str(e)
+            trace.set(error=str(e))
+        record["timings"] = trace.finish()
+        return record
+
+    def run(self, questions):
+        """Yield one result record per (question_id, question) pair, in input order"""
+        if not questions:
+            return
+        trace = Trace(
+            "batch_run",
+            sink=resources.get_metrics_sink(),
+            index_name=self.index_name,
+            workers=self.max_workers
+        )
+        trace.count(questions=len(questions))
+        # Batched embedding requests instead of one round trip per question
+        with trace.span("embed_questions"):
+            question_vectors = self.embeddings.embed_documents([question for _, question in questions])
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self._answer, question_id, question, question_vector)
+                for (question_id, question), question_vector in zip(questions, question_vectors)
+            ]
+            for future in futures:
+                yield future.result()
+        trace.finish()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a file of questions against an indexed document set.")
+    parser.add_argument("questions", help="Text file with one question per line, or JSONL with a \"question\" field")
+    parser.add_argument("-o", "--output", help="JSONL file to write answers to (default: stdout)")
+    parser.add_argument("--index", default=Config.DEFAULT_INDEX_NAME, help="Index to query")
+    parser.add_argument("--docs", nargs="+", help="Document IDs to limit retrieval to (default: all in the index)")
+    parser.add_argument("--workers", type=int, default=Config.BATCH_CONCURRENCY, help="Concurrent questions")
+    parser.add_argument("--use-cache", action="store_true", help="Serve and store answers in the semantic answer cache")
+    args = parser.parse_args(argv)
+
+    questions = load_questions(args.questions)
+    answerer = BatchAnswerer(args.index, doc_ids=args.docs, max_workers=args.workers, use_answer_cache=args.use_cache)
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    started = time.perf_counter()
+    failed = 0
+    try:
+        for record in answerer.run(questions):
+            failed += "error" in record
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Answered {len(questions) - failed}/{len(questions)} questions in {elapsed:.1f}s "
+        f"with {answerer.max_workers} workers",
+        file=sys.stderr
+    )
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,346 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from chat_engine import ChatEngine
+from config import Config
+from local_backend import LocalVectorIndex
+from tracing import Trace
+import resources
+
+# Reproducible ingestion and query benchmarks against the local backend:
+#
+#   python benchmark.py --pages 10 100 500 --queries 200 --embed-latency 0.05 -o baseline.json
+#   python benchmark.py --pages 10 100 500 --queries 200 --compare baseline.json
+#
+# Synthetic PDFs are generated from a fixed seed, and service latency is
+# injected into the local stand-ins, so runs are comparable across machines
+# and commits.
+
+_WORDS = (
+    "market revenue growth share competitor segment analysis forecast region "
+    "demand pricing margin customer channel supply product launch quarter strategy"
+).split()
+
+def _pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_synthetic_pdf(pages, lines_per_page=40, seed=0):
+    """Build a text PDF with one planted fact per page; returns (pdf bytes, facts)"""
+    rng = random.Random(seed)
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>", b""]
+    page_ids = []
+    facts = []
+    for page_number in range(1, pages + 1):
+        lines = [" ".join(rng.choice(_WORDS) for _ in range(12)) + "." for _ in range(lines_per_page)]
+        company = f"Company{page_number}"
+        amount = rng.randint(10, 999)
+        lines[rng.randrange(lines_per_page)] = f"{company} revenue in 2023 was {amount} million dollars."
+        facts.append((f"What was {company} revenue in 2023?", page_number))
+
+        operations = ["BT /F1 10 Tf 50 780 Td 12 TL"]
+        operations += [f"({_pdf_string(line)}) Tj T*" for line in lines]
+        operations.append("ET")
+        stream = "\n".join(operations).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 1 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % page_id for page_id in page_ids),
+        len(page_ids)
+    )
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        len(objects),
+        xref
+    )
+    return bytes(output), facts
+
+def summarize(values):
+    """Mean and p50/p95/p99 of a list of seconds"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "mean": round(float(values.mean()), 5),
+        "p50": round(float(p50), 5),
+        "p95": round(float(p95), 5),
+        "p99": round(float(p99), 5),
+    }
+
+def peak_memory_mb():
+    """Peak resident memory of this process and of finished extraction workers"""
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "process": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "workers": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+def use_local_backend(cache_dir, embed_latency, vector_latency, llm_latency, token_latency):
+    """Point the shared clients at fresh local stand-ins; call before any resources are created"""
+    Config.BACKEND = "local"
+    Config.CACHE_DIR = cache_dir
+    Config.LOCAL_INDEX_DIR = os.path.join(cache_dir, "indexes")
+    Config.SPARSE_INDEX_DIR = os.path.join(cache_dir, "sparse")
+    Config.JOBS_DIR = os.path.join(cache_dir, "jobs")
+    Config.METRICS_PATH = os.path.join(cache_dir, "metrics.jsonl")
+    Config.LOCAL_EMBED_LATENCY = embed_latency
+    Config.LOCAL_VECTOR_LATENCY = vector_latency
+    Config.LOCAL_LLM_LATENCY = llm_latency
+    Config.LOCAL_LLM_TOKEN_LATENCY = token_latency
+
+def benchmark_ingestion(processor, index_name, page_counts, repeats):
+    """Ingest a fresh synthetic PDF per size and repeat; returns per-size results and facts"""
+    results = []
+    facts = {}
+    for pages in page_counts:
+        pdf_bytes, facts[pages] = make_synthetic_pdf(pages)
+        runs = []
+        for repeat in range(repeats):
+            # A new file name per run, so no run is served by the incremental re-index
+            runs.append(processor.ingest_document(f"bench-{pages}p-{repeat}.pdf", io.BytesIO(pdf_bytes), index_name))
+        seconds = [run["seconds"] for run in runs]
+        stages = sorted({stage for run in runs for stage in run["stages"]})
+        results.append({
+            "pages": pages,
+            "chunks": runs[0]["chunks"],
+            "pdf_bytes": len(pdf_bytes),
+            "seconds": summarize(seconds),
+            "pages_per_second": round(pages / float(np.median(seconds)), 2),
+            "chunks_per_second": round(runs[0]["chunks"] / float(np.median(seconds)), 2),
+            "stages": {stage: summarize([run["stages"].get(stage, 0.0) for run in runs]) for stage in stages},
+            "peak_memory_mb": peak_memory_mb(),
+        })
+    return results, facts
+
+def benchmark_queries(processor, index_name, doc_id, facts, queries, concurrency, streaming):
+    """Answer planted-fact questions against one document; returns latency and throughput"""
+    vectorstore = processor.get_vectorstore(index_name)
+    namespaces = processor.catalog.namespaces(index_name, [doc_id])
+    rng = random.Random(1)
+    questions = [rng.choice(facts) for _ in range(queries)]
+
+    def run(question, page):
+        trace = Trace("benchmark")
+        if streaming:
+            sources, tokens = ChatEngine.stream_with_rag(
+                vectorstore, processor.llm, question,
+                namespaces=namespaces, index_name=index_name, trace=trace
+            )
+            "".join(tokens)
+        else:
+            _, sources = ChatEngine.answer_with_rag(
+                vectorstore, processor.llm, question,
+                namespaces=namespaces, index_name=index_name, trace=trace
+            )
+        timings = trace.finish()
+        hit = any(int(source.metadata.get("page_start", 0)) <= page <= int(source.metadata.get("page_end", 0))
+                  for source in sources)
+        return timings, hit
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(lambda fact: run(*fact), questions))
+    elapsed = time.perf_counter() - started
+
+    traces = [timings for timings, _ in outcomes]
+    stages = sorted({stage for timings in traces for stage in timings["stages"]})
+    return {
+        "queries": queries,
+        "concurrency": concurrency,
+        "streaming": streaming,
+        "queries_per_second": round(queries / elapsed, 2),
+        "latency": summarize([timings["total_seconds"] for timings in traces]),
+        "stages": {stage: summarize([timings["stages"].get(stage, 0.0) for timings in traces]) for stage in stages},
+        "context_tokens": summarize([timings["counts"].get("context_tokens", 0) for timings in traces]),
+        # Share of questions whose planted fact's page was among the sources
+        "source_recall": round(sum(hit for _, hit in outcomes) / queries, 3),
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+def benchmark_index(directory, vectors, dimension, queries, k, seed=0):
+    """Recall, scan latency and memory of int8 quantized search against exact float32 search"""
+    rng = np.random.default_rng(seed)
+    # Clustered vectors, so near neighbours are meaningful like real embeddings
+    centers = rng.standard_normal((max(1, vectors // 100), dimension)).astype(np.float32)
+    data = centers[rng.integers(len(centers), size=vectors)]
+    data += 0.5 * rng.standard_normal(data.shape).astype(np.float32)
+    probes = centers[rng.integers(len(centers), size=queries)]
+    probes += 0.5 * rng.standard_normal(probes.shape).astype(np.float32)
+
+    results = {"vectors": vectors, "dimension": dimension, "k": k}
+    exact_ids = None
+    for quantization in ("none", "int8"):
+        index = LocalVectorIndex(os.path.join(directory, quantization), dimension, quantization=quantization)
+        for start in range(0, vectors, 1000):
+            index.upsert(
+                vectors=[(str(row), data[row], {}) for row in range(start, min(start + 1000, vectors))],
+                namespace="bench"
+            )
+        index.query(probes[0], k, namespace="bench")
+
+        seconds = []
+        found = []
+        for probe in probes:
+            started = time.perf_counter()
+            matches = index.query(probe, k, namespace="bench")["matches"]
+            seconds.append(time.perf_counter() - started)
+            found.append({match["id"] for match in matches})
+        if exact_ids is None:
+            exact_ids = found
+        results[quantization] = {
+            "latency": summarize(seconds),
+            "memory_bytes": index.describe_index_stats()["namespaces"]["bench"]["memory_bytes"],
+            # Share of the exact float32 top-k that this layout returns
+            "recall": round(float(np.mean([len(a & b) / k for a, b in zip(found, exact_ids)])), 4),
+        }
+    results["memory_reduction"] = round(results["none"]["memory_bytes"] / results["int8"]["memory_bytes"], 2)
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _flatten(results):
+    """Comparable headline metrics keyed by name"""
+    metrics = {}
+    for run in results["ingestion"]:
+        metrics[f"ingest {run['pages']}p seconds p50"] = run["seconds"]["p50"]
+        metrics[f"ingest {run['pages']}p pages/s"] = run["pages_per_second"]
+    query = results["query"]
+    for percentile in ("p50", "p95", "p99"):
+        metrics[f"query latency {percentile}"] = query["latency"][percentile]
+    metrics["query throughput/s"] = query["queries_per_second"]
+    metrics["query source recall"] = query["source_recall"]
+    metrics["peak process memory MB"] = query["peak_memory_mb"]["process"]
+    if results.get("index"):
+        index = results["index"]
+        metrics["int8 index recall"] = index["int8"]["recall"]
+        metrics["int8 index query p50"] = index["int8"]["latency"]["p50"]
+        metrics["float32 index query p50"] = index["none"]["latency"]["p50"]
+    return metrics
+
+def compare(results, baseline):
+    """Print headline metrics next to a baseline run"""
+    current, previous = _flatten(results), _flatten(baseline)
+    print(f"{'metric':32} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, value in current.items():
+        before = previous.get(name)
+        if before is None:
+            print(f"{name:32} {'-':>12} {value:>12}")
+            continue
+        change = f"{(value - before) / before * 100:+.1f}%" if before else "-"
+        print(f"{name:32} {before:>12} {value:>12} {change:>8}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and query latency against local stand-ins.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200], help="Synthetic PDF sizes in pages")
+    parser.add_argument("--repeats", type=int, default=3, help="Ingestion runs per size")
+    parser.add_argument("--queries", type=int, default=100, help="Questions to answer")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent questions")
+    parser.add_argument("--streaming", action="store_true", help="Benchmark the streaming answer path")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Seconds per embedding request")
+    parser.add_argument("--vector-latency", type=float, default=0.0, help="Seconds per vector index request")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds before the first generated token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per generated token")
+    parser.add_argument("--index-vectors", type=int, default=0, help="Vectors for the int8 recall benchmark (0 skips it)")
+    parser.add_argument("--index-dimension", type=int, default=Config.EMBEDDING_DIMENSION, help="Vector dimension for it")
+    parser.add_argument("--index-queries", type=int, default=200, help="Queries for it")
+    parser.add_argument("-o", "--output", help="Write results as JSON, e.g. as a baseline")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="intellidoc-bench-") as cache_dir:
+        use_local_backend(cache_dir, args.embed_latency, args.vector_latency, args.llm_latency, args.token_latency)
+        processor = resources.get_document_processor()
+        processor.initialize_components()
+        index_name = "benchmark"
+
+        ingestion, facts = benchmark_ingestion(processor, index_name, args.pages, args.repeats)
+        largest = max(args.pages)
+        query = benchmark_queries(
+            processor,
+            index_name,
+            f"bench-{largest}p-0",
+            facts[largest],
+            args.queries,
+            args.concurrency,
+            args.streaming
+        )
+        index = None
+        if args.index_vectors:
+            index = benchmark_index(
+                os.path.join(cache_dir, "index-benchmark"),
+                args.index_vectors,
+                args.index_dimension,
+                args.index_queries,
+                Config.CONTEXT_CANDIDATES
+            )
+
+    results = {
+        "environment": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.time(),
+        },
+        "settings": {
+            **vars(args),
+            "chunk_size": Config.CHUNK_SIZE,
+            "chunk_overlap": Config.CHUNK_OVERLAP,
+            "context_token_budget": Config.CONTEXT_TOKEN_BUDGET,
+            "hybrid_search": Config.HYBRID_SEARCH,
+            "extraction_workers": Config.EXTRACTION_WORKERS,
+            "embed_batch_size": Config.EMBED_BATCH_SIZE,
+            "embed_concurrency": Config.EMBED_CONCURRENCY,
+        },
+        "ingestion": ingestion,
+        "query": query,
+        "index": index,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+    else:
+        print(json.dumps({"ingestion": ingestion, "query": query, "index": index}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -1,38 +1,318 @@
-from langchain.chains import RetrievalQA
+import threading
+import time
+
 from langchain.prompts import PromptTemplate
 
+from config import Config
+from retrieval import HybridRetriever, NamespaceRetriever
+from tracing import Trace
+import resources
+
+# Create a custom prompt template
+RAG_PROMPT = PromptTemplate(
+    template="""Use the following pieces of context to answer the question at the end.
+        If you don't know the answer based on the context, just say that you don't know, don't try to make up an answer.
+
+        {history}Context: {context}
+
+        Question: {question}
+        
+        Answer: """,
+    input_variables=["history", "context", "question"]
+)
+
+# Rewrites follow-ups like "and their 2023 revenue?" so retrieval sees the full question
+CONDENSE_PROMPT = PromptTemplate(
+    template="""Given the conversation below and a follow-up question, rephrase the follow-up question to be a standalone question that can be understood without the conversation.
+        If it already is one, return it unchanged. Reply with the standalone question only.
+
+        Conversation:
+        {history}
+
+        Follow-up question: {question}
+
+        Standalone question: """,
+    input_variables=["history", "question"]
+)
+
 class ChatEngine:
     """Handles RAG and direct LLM responses"""
     
+    # Retrievers per index and selection; vectorstores live as long as the process
+    _retrievers = {}
+    _retrievers_lock = threading.Lock()
+    
+    @staticmethod
+    def create_retriever(vectorstore, namespaces=None, index_name=None):
+        """Retriever over the whole vectorstore, or only the selected namespaces.
+        
+        Retrievers over-fetch CONTEXT_CANDIDATES chunks; the context builder
+        decides how many of them fit in the prompt. With MMR reranking they
+        pick those candidates from RERANK_FETCH_K matches.
+        """
+        k = Config.CONTEXT_CANDIDATES
+        if namespaces is None:
+            return vectorstore.as_retriever(search_kwargs={"k": k})
+        mmr_lambda = Config.MMR_LAMBDA if Config.RERANK_MMR else None
+        if Config.HYBRID_SEARCH and index_name:
+            # Fuse local BM25 keyword matches with vector similarity
+            return HybridRetriever(
+                vectorstore=vectorstore,
+                namespaces=list(namespaces),
+                k=k,
+                sparse_store=resources.get_sparse_index_store(),
+                index_name=index_name,
+                fetch_k=max(Config.HYBRID_FETCH_K, Config.RERANK_FETCH_K if Config.RERANK_MMR else 0, k),
+                alpha=Config.HYBRID_ALPHA,
+                mmr_lambda=mmr_lambda
+            )
+        return NamespaceRetriever(
+            vectorstore=vectorstore,
+            namespaces=list(namespaces),
+            k=k,
+            fetch_k=max(Config.RERANK_FETCH_K, k),
+            mmr_lambda=mmr_lambda
+        )
+    
+    @classmethod
+    def get_retriever(cls, vectorstore, namespaces=None, index_name=None):
+        """Return the cached retriever for a vectorstore and selection, building it once"""
+        key = (index_name, tuple(sorted(namespaces)) if namespaces is not None else None)
+        with cls._retrievers_lock:
+            cached = cls._retrievers.get(key)
+            # Rebuild if the index was reopened with a new vectorstore
+            if cached is None or cached[0] is not vectorstore:
+                cached = cls._retrievers[key] = (vectorstore, cls.create_retriever(vectorstore, namespaces, index_name))
+            return cached[1]
+    
+    @staticmethod
+    def _history_block(memory):
+        if memory is None or memory.is_empty():
+            return ""
+        return f"Conversation so far:\n{memory.render()}\n\n"
+    
     @staticmethod
-    def answer_with_rag(vectorstore, llm, question):
+    def condense_question(llm, question, memory=None, trace=None):
+        """Rewrite a follow-up into a standalone question using the conversation so far"""
+        if memory is None or memory.is_empty():
+            return question
+        trace = trace if trace is not None else Trace("condense")
+        with trace.span("condense_question"):
+            standalone = llm.invoke(CONDENSE_PROMPT.format(history=memory.render(), question=question)).content.strip()
+        if not standalone:
+            return question
+        trace.set(standalone_question=standalone)
+        return standalone
+    
+    @classmethod
+    def build_rag_prompt(
+        cls,
+        vectorstore,
+        question,
+        namespaces=None,
+        index_name=None,
+        question_vector=None,
+        trace=None,
+        memory=None
+    ):
+        """Retrieve candidates and pack them into the prompt; returns (prompt, sources)"""
+        trace = trace if trace is not None else Trace("rag")
+        retriever = cls.get_retriever(vectorstore, namespaces, index_name)
+        if hasattr(retriever, "retrieve_by_vector"):
+            # Embedding separately lets the trace tell embedding and search time apart
+            if question_vector is None:
+                with trace.span("embed_query"):
+                    question_vector = vectorstore.embeddings.embed_query(question)
+            with trace.span("retrieve"):
+                candidates = retriever.retrieve_by_vector(question, question_vector)
+        else:
+            with trace.span("retrieve"):
+                candidates = retriever.invoke(question)
+        with trace.span("pack_context"):
+            sources, context, context_tokens = resources.get_context_builder().build(candidates)
+        trace.count(candidates=len(candidates), context_chunks=len(sources), context_tokens=context_tokens)
+        prompt = RAG_PROMPT.format(history=cls._history_block(memory), context=context, question=question)
+        return prompt, sources
+    
+    @staticmethod
+    def _lookup_cache(answer_cache, cache_scope, question_vector, trace):
+        with trace.span("cache_lookup"):
+            cached = answer_cache.lookup(cache_scope, question_vector)
+        trace.set(cache_hit=cached is not None)
+        return cached
+    
+    @classmethod
+    def answer_with_rag(
+        cls,
+        vectorstore,
+        llm,
+        question,
+        answer_cache=None,
+        cache_scope=None,
+        namespaces=None,
+        index_name=None,
+        question_vector=None,
+        trace=None,
+        memory=None
+    ):
         """Answer question using RAG (Retrieval Augmented Generation)"""
-        # Create a custom prompt template
-        prompt_template = """Use the following pieces of context to answer the question at the end.
-        If you don't know the answer based on the context, just say that you don't know, don't try to make up an answer.
-
-        Context: {context}
-
-        Question: {question}
+        trace = trace if trace is not None else Trace("rag")
+        standalone = cls.condense_question(llm, question, memory, trace)
+        if standalone != question:
+            # A precomputed embedding belongs to the original wording
+            question, question_vector = standalone, None
+        if answer_cache is not None:
+            if question_vector is None:
+                with trace.span("embed_query"):
+                    question_vector = vectorstore.embeddings.embed_query(question)
+            cached = cls._lookup_cache(answer_cache, cache_scope, question_vector, trace)
+            if cached is not None:
+                return cached.answer, cached.sources
         
-        Answer: """
+        prompt, sources = cls.build_rag_prompt(
+            vectorstore, question, namespaces, index_name, question_vector, trace, memory
+        )
+        with trace.span("generate"):
+            response = llm.invoke(prompt)
+        cls._record_usage(trace, prompt, response.content, getattr(response, "usage_metadata", None))
+        if answer_cache is not None:
+            answer_cache.store(cache_scope, question_vector, response.content, sources)
+        return response.content, sources
+    
+    @classmethod
+    def stream_with_rag(
+        cls,
+        vectorstore,
+        llm,
+        question,
+        answer_cache=None,
+        cache_scope=None,
+        namespaces=None,
+        index_name=None,
+        trace=None,
+        memory=None
+    ):
+        """Retrieve context for the question, then stream the answer.
         
-        PROMPT = PromptTemplate(
-            template=prompt_template,
-            input_variables=["context", "question"]
+        Returns the source documents and an iterator over answer tokens, so
+        callers can show sources before generation starts. With an answer
+        cache, a close enough earlier question is answered without retrieval.
+        With conversation memory, follow-ups are first rewritten into
+        standalone questions and the bounded history is added to the prompt.
+        """
+        trace = trace if trace is not None else Trace("rag")
+        question = cls.condense_question(llm, question, memory, trace)
+        question_vector = None
+        if answer_cache is not None:
+            with trace.span("embed_query"):
+                question_vector = vectorstore.embeddings.embed_query(question)
+            cached = cls._lookup_cache(answer_cache, cache_scope, question_vector, trace)
+            if cached is not None:
+                return cached.sources, iter([cached.answer])
+        
+        prompt, sources = cls.build_rag_prompt(
+            vectorstore, question, namespaces, index_name, question_vector, trace, memory
         )
+        tokens = cls._stream_tokens(llm, prompt, trace)
+        if answer_cache is not None:
+            tokens = cls._store_when_done(
+                tokens,
+                lambda answer: answer_cache.store(cache_scope, question_vector, answer, sources)
+            )
+        return sources, tokens
+    
+    @classmethod
+    def stream_with_llm(
+        cls,
+        llm,
+        question,
+        answer_cache=None,
+        cache_scope=None,
+        embeddings=None,
+        trace=None,
+        memory=None
+    ):
+        """Stream answer tokens from the LLM without context"""
+        trace = trace if trace is not None else Trace("llm")
+        question = cls.condense_question(llm, question, memory, trace)
+        if answer_cache is not None:
+            with trace.span("embed_query"):
+                question_vector = embeddings.embed_query(question)
+            cached = cls._lookup_cache(answer_cache, cache_scope, question_vector, trace)
+            if cached is not None:
+                return iter([cached.answer])
         
-        # Create RetrievalQA chain
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=vectorstore.as_retriever(search_kwargs={"k": 3}),
-            chain_type_kwargs={"prompt": PROMPT},
-            return_source_documents=True
+        tokens = cls._stream_tokens(llm, cls._history_block(memory) + question, trace)
+        if answer_cache is not None:
+            tokens = cls._store_when_done(
+                tokens,
+                lambda answer: answer_cache.store(cache_scope, question_vector, answer, [])
+            )
+        return tokens
+    
+    @classmethod
+    def _stream_tokens(cls, llm, prompt, trace):
+        # Generation time includes time the caller spends rendering each token
+        start = time.perf_counter()
+        parts = []
+        usage = None
+        for chunk in llm.stream(prompt):
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if chunk.content:
+                if not parts:
+                    # Part of generate, so kept apart from the stage times
+                    trace.set(first_token_seconds=round(time.perf_counter() - start, 4))
+                parts.append(chunk.content)
+                yield chunk.content
+        trace.add_time("generate", time.perf_counter() - start)
+        cls._record_usage(trace, prompt, "".join(parts), usage)
+    
+    @staticmethod
+    def _record_usage(trace, prompt, answer, usage):
+        if usage:
+            trace.count(prompt_tokens=usage["input_tokens"], completion_tokens=usage["output_tokens"])
+            return
+        # Streamed responses usually carry no usage, so count the tokens locally
+        context_builder = resources.get_context_builder()
+        trace.count(
+            prompt_tokens=context_builder.count_tokens(prompt),
+            completion_tokens=context_builder.count_tokens(answer)
         )
+        trace.set(usage_estimated=True)
+    
+    @staticmethod
+    def _store_when_done(tokens, store):
+        # Only complete answers are cached; an interrupted stream stores nothing
+        parts = []
+        for token in tokens:
+            parts.append(token)
+            yield token
+        store("".join(parts))
+    
+    @staticmethod
+    def format_citation(document):
+        """Format a source document's page and offset metadata as a citation"""
+        metadata = document.metadata
+        source = metadata.get("source", "Document")
+        if "page_start" not in metadata:
+            return source
         
-        result = qa_chain({"query": question})
-        return result["result"], result["source_documents"]
+        # Pinecone returns numeric metadata as floats
+        page_start = int(metadata["page_start"])
+        page_end = int(metadata.get("page_end", page_start))
+        # Rows for tables, nothing for unpaged text such as HTML, pages otherwise
+        unit = metadata.get("unit", "page")
+        if unit == "row":
+            rows = f"row {page_start}" if page_start == page_end else f"rows {page_start}-{page_end}"
+            citation = f"{source}, {rows}"
+        elif unit == "text":
+            citation = source
+        else:
+            pages = f"p. {page_start}" if page_start == page_end else f"pp. {page_start}-{page_end}"
+            citation = f"{source}, {pages}"
+        if "start_index" in metadata and "end_index" in metadata:
+            citation += f" (chars {int(metadata['start_index'])}-{int(metadata['end_index'])})"
+        return citation
     
     @staticmethod
     def answer_with_llm(llm, question):
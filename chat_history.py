@@ -0,0 +1,58 @@
+from ui_components import UIComponents
+
+class ChatMessage:
+    """A chat message with its HTML rendered once, when it is added"""
+
+    __slots__ = ("role", "content", "details", "html")
+
+    def __init__(self, role, content, details):
+        self.role = role
+        self.content = content
+        self.details = details
+        self.html = UIComponents.message_html(role, content, details)
+
+class ChatHistory:
+    """Chat messages with pre-rendered HTML and a paginated view of the latest turns.
+
+    Messages never change once added, so each is rendered to HTML when it is
+    appended and reruns only write out the visible ones. Only the most
+    recent page_turns turns are shown until earlier ones are requested, so
+    rerun cost stays flat however long the session runs.
+    """
+
+    def __init__(self, page_turns=20):
+        self.page_turns = page_turns
+        self.visible_turns = page_turns
+        self.messages = []
+        # Index of the message that starts each turn
+        self._turn_starts = []
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def append(self, role, content, **details):
+        """Add a message; assistant details (mode, sources, timings) go in the analysis details"""
+        if role == "user" or not self._turn_starts:
+            self._turn_starts.append(len(self.messages))
+        self.messages.append(ChatMessage(role, content, details))
+
+    def clear(self):
+        self.messages = []
+        self._turn_starts = []
+        self.visible_turns = self.page_turns
+
+    @property
+    def hidden_turns(self):
+        return max(0, len(self._turn_starts) - self.visible_turns)
+
+    def show_earlier(self):
+        """Reveal one more page of older turns"""
+        self.visible_turns += self.page_turns
+
+    def visible(self):
+        """Messages in the visible turns, oldest first"""
+        start = self._turn_starts[self.hidden_turns] if self._turn_starts else 0
+        return self.messages[start:]
\ No newline at end of file
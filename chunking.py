@@ -0,0 +1,74 @@
+from langchain_core.documents import Document
+
+def _page_span(page_starts, start, end):
+    """Return the first and last page numbers covering the text range [start, end)"""
+    covered = [
+        page_number
+        for i, (page_start, page_number) in enumerate(page_starts)
+        if page_start < end and (i + 1 == len(page_starts) or page_starts[i + 1][0] > start)
+    ]
+    return covered[0], covered[-1]
+
+def stream_chunks(pages, text_splitter, metadata=None, overlap=0):
+    """Split a stream of (page_number, text) tuples into Documents in a single pass.
+
+    Offsets refer to the document text as if all pages had been joined with
+    newlines, but the full text is never built. Each Document carries the
+    base metadata plus page_start/page_end and start_index/end_index.
+    overlap must match the splitter's chunk overlap so pieces are located correctly.
+    """
+    metadata = metadata or {}
+    buffer = None
+    buffer_start = 0
+    text_length = 0
+    # (offset, page_number) for every page that still overlaps the buffer
+    page_starts = []
+
+    def make_documents(pieces):
+        search_from = 0
+        for piece in pieces:
+            local_start = buffer.find(piece, search_from)
+            if local_start < 0:
+                local_start = search_from
+            # The next piece can only start inside this one's overlap region
+            search_from = max(local_start + 1, local_start + len(piece) - overlap)
+
+            start = buffer_start + local_start
+            end = start + len(piece)
+            page_start, page_end = _page_span(page_starts, start, end)
+            yield Document(
+                page_content=piece,
+                metadata={
+                    **metadata,
+                    "page_start": page_start,
+                    "page_end": page_end,
+                    "start_index": start,
+                    "end_index": end,
+                }
+            )
+
+    for page_number, page_text in pages:
+        # Pages are separated by a newline, as if the full text had been joined
+        if buffer is None:
+            buffer = page_text
+            page_offset = 0
+        else:
+            buffer = f"{buffer}\n{page_text}"
+            page_offset = text_length + 1
+        page_starts.append((page_offset, page_number))
+        text_length = page_offset + len(page_text)
+
+        pieces = text_splitter.split_text(buffer)
+        if len(pieces) > 1:
+            # The last piece may continue on the next page, so keep it buffered
+            yield from make_documents(pieces[:-1])
+            tail_start = max(buffer.rfind(pieces[-1]), 0)
+            buffer = buffer[tail_start:]
+            buffer_start += tail_start
+
+            # Drop pages that ended before the buffered tail
+            while len(page_starts) > 1 and page_starts[1][0] <= buffer_start:
+                page_starts.pop(0)
+
+    if buffer and buffer.strip():
+        yield from make_documents(text_splitter.split_text(buffer))
\ No newline at end of file
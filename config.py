@@ -13,15 +13,102 @@ class Config:
     AZURE_OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT")
     DEPLOYMENT_NAME = os.environ.get("DEPLOYMENT_NAME")
     
+    # Backend selection: "azure" (Pinecone + Azure OpenAI) or "local" (offline stand-ins)
+    BACKEND = os.environ.get("INTELLIDOC_BACKEND", "azure").lower()
+    
     # Default settings
     DEFAULT_INDEX_NAME = "intellidoc-index"
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 20
-    EMBEDDING_DIMENSION = 1536
+    # text-embedding-3 models can return shortened vectors, e.g. 512 or 256 dimensions
+    EMBEDDING_DIMENSION = int(os.environ.get("EMBEDDING_DIMENSION", "1536"))
+    EMBEDDING_MODEL = "text-embedding-3-small"
+    EMBEDDING_DEPLOYMENT = "text-embedding-3-small"
+    
+    # Ingestion settings
+    EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+    EXTRACTION_PAGES_PER_TASK = 8
+    EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "128"))
+    EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "4"))
+    UPSERT_BATCH_SIZE = int(os.environ.get("UPSERT_BATCH_SIZE", "100"))
+    UPSERT_CONCURRENCY = int(os.environ.get("UPSERT_CONCURRENCY", "4"))
+    RATE_LIMIT_MAX_RETRIES = 6
+    
+    # Background ingestion jobs; each one also uses the extraction and upload pools above
+    INGESTION_WORKERS = int(os.environ.get("INGESTION_WORKERS", "2"))
+    # Ceiling on the memory one session's ingestion jobs may hold at once, in MB; 0 disables it
+    INGESTION_MEMORY_LIMIT_MB = int(os.environ.get("INGESTION_MEMORY_LIMIT_MB", "1024"))
+    
+    # Shared HTTP connection pool for Azure OpenAI
+    HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "32"))
+    HTTP_TIMEOUT = 60.0
+    
+    # Local cache settings
+    CACHE_DIR = os.environ.get("INTELLIDOC_CACHE_DIR", ".intellidoc_cache")
+    LOCAL_INDEX_DIR = os.path.join(CACHE_DIR, "indexes")
+    # "int8" scans scalar-quantized vectors and re-scores the best candidates exactly;
+    # it cuts scan memory about 4x, but scans are no faster than float32 ones
+    LOCAL_INDEX_QUANTIZATION = os.environ.get("LOCAL_INDEX_QUANTIZATION", "none").lower()
+    # Simulated service latency in seconds for the local backend, for benchmarks
+    LOCAL_EMBED_LATENCY = float(os.environ.get("LOCAL_EMBED_LATENCY", "0"))
+    LOCAL_VECTOR_LATENCY = float(os.environ.get("LOCAL_VECTOR_LATENCY", "0"))
+    LOCAL_LLM_LATENCY = float(os.environ.get("LOCAL_LLM_LATENCY", "0"))
+    LOCAL_LLM_TOKEN_LATENCY = float(os.environ.get("LOCAL_LLM_TOKEN_LATENCY", "0"))
+    JOBS_DIR = os.path.join(CACHE_DIR, "jobs")
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+    
+    # Hybrid retrieval settings
+    HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "true").lower() == "true"
+    HYBRID_ALPHA = float(os.environ.get("HYBRID_ALPHA", "0.5"))
+    HYBRID_FETCH_K = 20
+    SPARSE_INDEX_DIR = os.path.join(CACHE_DIR, "sparse")
+    
+    # Reranking: over-fetch RERANK_FETCH_K chunks with their vectors and pick a
+    # diverse top set with MMR; 1.0 ranks on relevance only, lower favours diversity
+    RERANK_MMR = os.environ.get("RERANK_MMR", "true").lower() == "true"
+    RERANK_FETCH_K = int(os.environ.get("RERANK_FETCH_K", "24"))
+    MMR_LAMBDA = float(os.environ.get("MMR_LAMBDA", "0.7"))
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+    
+    # Context packing settings
+    CONTEXT_CANDIDATES = int(os.environ.get("CONTEXT_CANDIDATES", "8"))
+    CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1500"))
+    CONTEXT_MIN_RELATIVE_SCORE = 0.5
+    TOKEN_ENCODING = os.environ.get("TOKEN_ENCODING", "cl100k_base")
+    
+    # Conversation memory: recent turns plus a running summary of older ones
+    HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "800"))
+    HISTORY_SUMMARY_TOKEN_BUDGET = int(os.environ.get("HISTORY_SUMMARY_TOKEN_BUDGET", "300"))
+    
+    # Chat turns rendered per page; older turns load on demand
+    CHAT_HISTORY_PAGE_TURNS = int(os.environ.get("CHAT_HISTORY_PAGE_TURNS", "20"))
+    
+    # Batch question answering settings
+    BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+    
+    # Map-reduce summaries and comparisons; partial summaries are cached on disk
+    SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", "8"))
+    SUMMARY_REDUCE_TOKEN_BUDGET = int(os.environ.get("SUMMARY_REDUCE_TOKEN_BUDGET", "3000"))
+    SUMMARY_WORDS = int(os.environ.get("SUMMARY_WORDS", "200"))
+    SUMMARY_CACHE_MAX_ENTRIES = int(os.environ.get("SUMMARY_CACHE_MAX_ENTRIES", "50000"))
+    
+    # Semantic answer cache settings
+    ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+    ANSWER_CACHE_TTL_SECONDS = int(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    ANSWER_CACHE_MAX_ENTRIES = 1000
+    
+    # Stage timing metrics, appended as JSON Lines
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_PATH = os.environ.get("METRICS_PATH", os.path.join(CACHE_DIR, "metrics.jsonl"))
     
     @classmethod
     def validate_environment(cls):
         """Validate that all required environment variables are set"""
+        if cls.BACKEND == "local":
+            return True
+        if cls.BACKEND != "azure":
+            raise EnvironmentError(f"Unknown INTELLIDOC_BACKEND: {cls.BACKEND}")
+        
         missing_vars = []
         if not cls.PINECONE_API_KEY:
             missing_vars.append("PINECONE_API_KEY")
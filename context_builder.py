@@ -0,0 +1,113 @@
+import re
+
+import tiktoken
+
+class _ApproximateEncoding:
+    """Roughly four characters per token, for air-gapped hosts without tiktoken data"""
+
+    def encode(self, text):
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+def load_encoding(encoding_name):
+    """Return the tiktoken encoding, or an approximation when it cannot be downloaded"""
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception:
+        return _ApproximateEncoding()
+
+class ContextBuilder:
+    """Packs the most relevant, non-redundant chunks into a prompt token budget.
+
+    Candidates are expected in relevance order. Chunks that overlap an
+    already packed chunk of the same document, or whose word shingles are
+    nearly identical to one, are skipped. Candidates scoring well below the
+    best match (metadata "score") are dropped, so simple questions use
+    fewer tokens than the budget allows.
+    """
+
+    def __init__(
+        self,
+        token_budget,
+        encoding_name="cl100k_base",
+        duplicate_threshold=0.8,
+        overlap_threshold=0.5,
+        min_relative_score=0.5,
+        separator="\n\n"
+    ):
+        self.token_budget = token_budget
+        self.encoding = load_encoding(encoding_name)
+        self.duplicate_threshold = duplicate_threshold
+        self.overlap_threshold = overlap_threshold
+        self.min_relative_score = min_relative_score
+        self.separator = separator
+        self.separator_tokens = len(self.encoding.encode(separator))
+
+    def count_tokens(self, text):
+        """Number of tokens the text takes in the prompt"""
+        return len(self.encoding.encode(text))
+
+    @staticmethod
+    def _shingles(text, size=5):
+        words = re.findall(r"\w+", text.lower())
+        if len(words) < size:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def _overlaps(self, document, other):
+        metadata, other_metadata = document.metadata, other.metadata
+        if metadata.get("doc_id") != other_metadata.get("doc_id"):
+            return False
+        if "start_index" not in metadata or "start_index" not in other_metadata:
+            return False
+        start, end = metadata["start_index"], metadata["end_index"]
+        other_start, other_end = other_metadata["start_index"], other_metadata["end_index"]
+        shared = min(end, other_end) - max(start, other_start)
+        shorter = min(end - start, other_end - other_start)
+        return shorter > 0 and shared / shorter >= self.overlap_threshold
+
+    def _is_redundant(self, document, shingles, packed):
+        for other, other_shingles in packed:
+            if self._overlaps(document, other):
+                return True
+            union = len(shingles | other_shingles)
+            if union and len(shingles & other_shingles) / union >= self.duplicate_threshold:
+                return True
+        return False
+
+    def build(self, candidates):
+        """Return (packed documents, context text, tokens used)"""
+        scores = [doc.metadata["score"] for doc in candidates if "score" in doc.metadata]
+        cutoff = max(scores) * self.min_relative_score if scores and max(scores) > 0 else None
+
+        packed = []
+        parts = []
+        tokens_used = 0
+        for document in candidates:
+            if cutoff is not None and document.metadata.get("score", cutoff) < cutoff:
+                continue
+
+            shingles = self._shingles(document.page_content)
+            if self._is_redundant(document, shingles, packed):
+                continue
+
+            tokens = self.encoding.encode(document.page_content)
+            cost = len(tokens) + (self.separator_tokens if parts else 0)
+            if tokens_used + cost > self.token_budget:
+                if packed:
+                    # A smaller candidate further down may still fit
+                    continue
+                # Always include the best match, truncated to the budget
+                text = self.encoding.decode(tokens[:self.token_budget])
+                packed.append((document, shingles))
+                parts.append(text)
+                tokens_used = self.token_budget
+                break
+
+            packed.append((document, shingles))
+            parts.append(document.page_content)
+            tokens_used += cost
+
+        return [document for document, _ in packed], self.separator.join(parts), tokens_used
\ No newline at end of file
@@ -0,0 +1,82 @@
+from langchain.prompts import PromptTemplate
+
+from tracing import Trace
+import resources
+
+SUMMARY_PROMPT = PromptTemplate(
+    template="""Progressively summarize the conversation between an analyst and an assistant, adding to the current summary.
+        Keep the companies, figures, periods and documents discussed. Reply with the new summary only, in at most {max_words} words.
+
+        Current summary: {summary}
+
+        Conversation to summarize:
+        {conversation}
+
+        New summary: """,
+    input_variables=["summary", "conversation", "max_words"]
+)
+
+class ConversationMemory:
+    """Recent chat turns within a token budget, with older turns folded into a running summary.
+
+    History never takes more than token_budget tokens of recent turns plus
+    summary_token_budget tokens of summary, so prompts stay the same size
+    however long the session runs.
+    """
+
+    def __init__(self, token_budget=800, summary_token_budget=300):
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.turns = []
+        self.summary = ""
+
+    def __len__(self):
+        return len(self.turns)
+
+    def is_empty(self):
+        return not self.turns and not self.summary
+
+    def clear(self):
+        self.turns = []
+        self.summary = ""
+
+    @staticmethod
+    def _format_turns(turns):
+        return "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer, _ in turns)
+
+    def render(self):
+        """The history as prompt text: running summary first, then recent turns"""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation: {self.summary}")
+        if self.turns:
+            parts.append(self._format_turns(self.turns))
+        return "\n".join(parts)
+
+    def add_turn(self, question, answer, llm, trace=None):
+        """Record a turn, summarizing the oldest turns once recent history exceeds its budget"""
+        context_builder = resources.get_context_builder()
+        tokens = context_builder.count_tokens(f"User: {question}\nAssistant: {answer}")
+        self.turns.append((question, answer, tokens))
+
+        overflow = []
+        while self.turns and sum(turn[2] for turn in self.turns) > self.token_budget:
+            overflow.append(self.turns.pop(0))
+        if not overflow:
+            return
+
+        prompt = SUMMARY_PROMPT.format(
+            summary=self.summary or "(none)",
+            conversation=self._format_turns(overflow),
+            # Roughly three words per four tokens
+            max_words=self.summary_token_budget * 3 // 4
+        )
+        trace = trace if trace is not None else Trace("memory")
+        with trace.span("summarize_history"):
+            summary = llm.invoke(prompt).content.strip()
+
+        # Hard cap, in case the model ignores the length instruction
+        encoded = context_builder.encoding.encode(summary)
+        if len(encoded) > self.summary_token_budget:
+            summary = context_builder.encoding.decode(encoded[:self.summary_token_budget])
+        self.summary = summary
\ No newline at end of file
@@ -0,0 +1,60 @@
+import json
+import os
+import threading
+import time
+
+from file_utils import atomic_write_json
+
+class DocumentCatalog:
+    """Registry of indexed documents and the namespace each one is stored in"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self):
+        atomic_write_json(self.path, self._data, indent=2)
+
+    def register(self, index_name, doc_id, name, namespace, pages, chunks):
+        """Add or update a document after it has been indexed"""
+        with self._lock:
+            self._data.setdefault(index_name, {})[doc_id] = {
+                "doc_id": doc_id,
+                "name": name,
+                "namespace": namespace,
+                "pages": pages,
+                "chunks": chunks,
+                "indexed_at": time.time(),
+            }
+            self._save()
+
+    def get(self, index_name, doc_id):
+        """Return a document entry, or None"""
+        with self._lock:
+            entry = self._data.get(index_name, {}).get(doc_id)
+            return dict(entry) if entry else None
+
+    def list(self, index_name):
+        """Return the documents in an index, most recently indexed first"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._data.get(index_name, {}).values()]
+        return sorted(entries, key=lambda entry: entry["indexed_at"], reverse=True)
+
+    def namespaces(self, index_name, doc_ids):
+        """Map selected document IDs to their namespaces, skipping unknown ones"""
+        with self._lock:
+            documents = self._data.get(index_name, {})
+            return [documents[doc_id]["namespace"] for doc_id in doc_ids if doc_id in documents]
+
+    def remove(self, index_name, doc_id):
+        """Forget a document"""
+        with self._lock:
+            if self._data.get(index_name, {}).pop(doc_id, None) is not None:
+                self._save()
\ No newline at end of file
@@ -0,0 +1,266 @@
+import csv
+import io
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from chunking import stream_chunks
+from config import Config
+from pdf_extraction import iter_pdf_pages
+
+# Loaders by lower-case file extension. Each loader takes a binary file,
+# a text splitter, base metadata and a trace, and yields chunks tagged with
+# their location (pages or rows) and character offsets where these apply.
+LOADERS = {}
+
+# Text files are decoded and parsed in blocks of this many characters
+READ_BLOCK_CHARS = 64 * 1024
+
+def register_loader(*extensions):
+    """Register a loader function for one or more file extensions"""
+    def decorator(loader):
+        for extension in extensions:
+            LOADERS[extension.lower()] = loader
+        return loader
+    return decorator
+
+def supported_extensions():
+    return sorted(extension.lstrip(".") for extension in LOADERS)
+
+def get_loader(file_name):
+    """Return the loader for a file name, or raise ValueError for unsupported types"""
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension not in LOADERS:
+        raise ValueError(
+            f"Unsupported file type '{extension or file_name}'. "
+            f"Supported types: {', '.join(supported_extensions())}."
+        )
+    return LOADERS[extension]
+
+def load_chunks(file_name, file, text_splitter, metadata, trace):
+    """Yield the chunks of a document, picking the loader by file type"""
+    return get_loader(file_name)(file, text_splitter, metadata, trace)
+
+def _text_stream(file):
+    # Undecodable bytes are replaced rather than failing the whole upload
+    return io.TextIOWrapper(file, encoding="utf-8-sig", errors="replace", newline="")
+
+@register_loader(".pdf")
+def load_pdf(file, text_splitter, metadata, trace):
+    # Extraction workers open the PDF by path, so a file on disk is never copied into memory;
+    # in-memory uploads are spooled to a temporary file first
+    name = getattr(file, "name", None)
+    if isinstance(file, io.BufferedReader) and isinstance(name, str) and os.path.exists(name):
+        path, spooled = name, False
+    else:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as spool:
+            shutil.copyfileobj(file, spool)
+        path, spooled = spool.name, True
+
+    try:
+        pages = iter_pdf_pages(
+            path,
+            max_workers=Config.EXTRACTION_WORKERS,
+            pages_per_task=Config.EXTRACTION_PAGES_PER_TASK
+        )
+        yield from stream_chunks(
+            trace.timed(pages, "extract"), text_splitter, metadata, overlap=Config.CHUNK_OVERLAP
+        )
+    finally:
+        if spooled:
+            os.remove(path)
+
+@register_loader(".csv")
+def load_csv(file, text_splitter, metadata, trace):
+    """Stream rows into chunks of whole rows, each starting with the column headers.
+
+    Chunks are located by data row numbers (the header row excluded) instead
+    of pages, and rows longer than a chunk are split with the header repeated.
+    The header counts against the chunk size, so no chunk exceeds CHUNK_SIZE.
+    """
+    text = _text_stream(file)
+    try:
+        rows = trace.timed(csv.reader(text), "extract")
+        header = next((row for row in rows if any(cell.strip() for cell in row)), None)
+        if header is None:
+            return
+        # The header is repeated in every chunk, so cap it at half a chunk to leave room for rows
+        header_line = " | ".join(cell.strip() for cell in header)[:Config.CHUNK_SIZE // 2]
+        metadata = {**metadata, "unit": "row"}
+
+        # Oversized rows are split into pieces that fit next to the header
+        row_size = Config.CHUNK_SIZE - len(header_line) - 1
+        row_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=row_size,
+            chunk_overlap=min(Config.CHUNK_OVERLAP, row_size // 2)
+        )
+
+        def make_document(lines, row_start, row_end):
+            return Document(
+                page_content="\n".join([header_line, *lines]),
+                metadata={**metadata, "page_start": row_start, "page_end": row_end}
+            )
+
+        lines = []
+        length = len(header_line)
+        row_start = last_row = None
+        for row_number, row in enumerate(rows, start=1):
+            if not any(cell.strip() for cell in row):
+                continue
+            line = " | ".join(cell.strip() for cell in row)
+            if lines and length + 1 + len(line) > Config.CHUNK_SIZE:
+                yield make_document(lines, row_start, last_row)
+                lines = []
+                length = len(header_line)
+            if not lines and length + 1 + len(line) > Config.CHUNK_SIZE:
+                # A single oversized row is split on its own
+                for piece in row_splitter.split_text(line):
+                    yield make_document([piece], row_number, row_number)
+                continue
+            if not lines:
+                row_start = row_number
+            lines.append(line)
+            length += 1 + len(line)
+            last_row = row_number
+        if lines:
+            yield make_document(lines, row_start, last_row)
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+class _HTMLTextParser(HTMLParser):
+    """Collects the visible text of an HTML page as one string per block element"""
+
+    BLOCK_TAGS = {
+        "address", "article", "aside", "blockquote", "br", "caption", "dd", "div", "dl", "dt",
+        "figcaption", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li",
+        "main", "nav", "ol", "p", "pre", "section", "table", "title", "tr", "ul",
+    }
+    SKIPPED_TAGS = {"noscript", "script", "style", "svg", "template"}
+    CELL_TAGS = {"td", "th"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self._parts = []
+        self._skipped = []
+
+    def _end_block(self):
+        text = re.sub(r"\s+", " ", "".join(self._parts)).strip(" |")
+        if text:
+            self.blocks.append(text)
+        self._parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skipped.append(tag)
+        elif tag in self.BLOCK_TAGS:
+            self._end_block()
+        elif tag in self.CELL_TAGS and self._parts:
+            self._parts.append(" | ")
+
+    def handle_endtag(self, tag):
+        if self._skipped and tag == self._skipped[-1]:
+            self._skipped.pop()
+        elif tag in self.BLOCK_TAGS:
+            self._end_block()
+
+    def handle_data(self, data):
+        if not self._skipped:
+            self._parts.append(data)
+
+    def close(self):
+        super().close()
+        self._end_block()
+
+@register_loader(".html", ".htm")
+def load_html(file, text_splitter, metadata, trace):
+    """Parse HTML incrementally into text blocks, skipping scripts and styles.
+
+    HTML has no pages, so chunks carry character offsets only.
+    """
+    text = _text_stream(file)
+    parser = _HTMLTextParser()
+
+    def blocks():
+        try:
+            while True:
+                data = text.read(READ_BLOCK_CHARS)
+                if data:
+                    parser.feed(data)
+                else:
+                    parser.close()
+                for block in parser.blocks:
+                    yield 1, block
+                parser.blocks = []
+                if not data:
+                    return
+        finally:
+            text.detach()
+
+    return stream_chunks(
+        trace.timed(blocks(), "extract"), text_splitter, {**metadata, "unit": "text"},
+        overlap=Config.CHUNK_OVERLAP
+    )
+
+_WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+@register_loader(".docx")
+def load_docx(file, text_splitter, metadata, trace):
+    """Stream paragraphs out of a Word document, including those in tables.
+
+    Word files do not store page numbers; pages are counted from explicit
+    page breaks and the break positions Word saves when it last laid out
+    the document, so they match what the author saw.
+    """
+    def paragraphs():
+        with zipfile.ZipFile(file) as archive, archive.open("word/document.xml") as xml:
+            page_number = 1
+            parts = []
+            # Word also saves a rendered break at the start of the page after
+            # an explicit one; that marks the same page and is not counted again
+            after_hard_break = False
+            for event, element in ElementTree.iterparse(xml, events=("start", "end")):
+                tag = element.tag
+                if event == "start":
+                    if tag == f"{_WORD_NAMESPACE}br" and element.get(f"{_WORD_NAMESPACE}type") == "page":
+                        is_page_break = True
+                        after_hard_break = True
+                    elif tag == f"{_WORD_NAMESPACE}lastRenderedPageBreak":
+                        is_page_break = not after_hard_break
+                        after_hard_break = False
+                    else:
+                        is_page_break = False
+                    if is_page_break:
+                        text = "".join(parts).strip()
+                        if text:
+                            yield page_number, text
+                        parts = []
+                        page_number += 1
+                    continue
+                if tag == f"{_WORD_NAMESPACE}t":
+                    if element.text and element.text.strip():
+                        after_hard_break = False
+                    parts.append(element.text or "")
+                elif tag == f"{_WORD_NAMESPACE}tab":
+                    parts.append("\t")
+                elif tag == f"{_WORD_NAMESPACE}br" and element.get(f"{_WORD_NAMESPACE}type") != "page":
+                    parts.append("\n")
+                elif tag == f"{_WORD_NAMESPACE}p":
+                    text = "".join(parts).strip()
+                    if text:
+                        yield page_number, text
+                    parts = []
+                    # Parsed paragraphs are dropped so memory stays flat on long documents
+                    element.clear()
+
+    return stream_chunks(
+        trace.timed(paragraphs(), "extract"), text_splitter, metadata, overlap=Config.CHUNK_OVERLAP
+    )
\ No newline at end of file
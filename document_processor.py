@@ -1,120 +1,274 @@
-import tempfile
 import os
-from PyPDF2 import PdfReader
+import sys
+from collections import deque
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import AzureOpenAIEmbeddings, AzureChatOpenAI
-from langchain_pinecone import Pinecone as PineconeVectorStore
-from pinecone import Pinecone, ServerlessSpec
 import streamlit as st
-import time
+from concurrent.futures import ThreadPoolExecutor
 
 from config import Config
+from document_catalog import DocumentCatalog
+from document_loaders import load_chunks
+from index_manifest import DocumentManifest, make_chunk_id, make_document_id, make_metadata_hash
+from index_registry import IndexRegistry
+from ingestion import IngestionEngine
+from tracing import Trace
+import resources
+
+# Each value of an embedding list costs a float object plus its slot in the list
+_VECTOR_VALUE_BYTES = 32
+
+def _in_memory_size(file):
+    """Bytes an upload holds in memory; files read from disk hold none"""
+    getbuffer = getattr(file, "getbuffer", None)
+    if getbuffer is None:
+        return 0
+    with getbuffer() as view:
+        return view.nbytes
 
 class DocumentProcessor:
-    """Handles PDF processing and vector store operations"""
+    """Handles document processing and vector store operations"""
     
     def __init__(self):
         self.pc = None
         self.embeddings = None
         self.llm = None
+        self.index_registry = None
+        self.manifest = DocumentManifest(os.path.join(Config.CACHE_DIR, "manifest.json"))
+        self.catalog = DocumentCatalog(os.path.join(Config.CACHE_DIR, "catalog.json"))
+        # One vector store per index; documents are separated by namespace
+        self._vectorstores = {}
         
     def initialize_components(self):
-        """Initialize Pinecone and Azure OpenAI components"""
+        """Initialize Pinecone and Azure OpenAI components (or their local stand-ins)"""
         Config.validate_environment()
         
-        # Initialize Pinecone
-        self.pc = Pinecone(api_key=Config.PINECONE_API_KEY)
+        # Clients are created once per process and reused across reruns
+        self.pc = resources.get_pinecone_client()
+        self.index_registry = IndexRegistry(self.pc)
+        self.embeddings = resources.get_embeddings()
+        self.llm = resources.get_llm()
         
-        # Initialize embeddings
-        self.embeddings = AzureOpenAIEmbeddings(
-            deployment="text-embedding-3-small",
-            model="text-embedding-3-small",
-            openai_api_type="azure",
-            openai_api_key=Config.AZURE_OPENAI_KEY,
-            azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
-            openai_api_version="2023-05-15",
-            chunk_size=2048
-        )
+        return self.pc, self.embeddings, self.llm
+    
+    def get_vectorstore(self, index_name, index=None):
+        """Return the shared vector store for an index, creating it on first use"""
+        if index_name not in self._vectorstores:
+            if index is None:
+                index = self.index_registry.get_index(index_name)
+            self._vectorstores[index_name] = resources.create_vectorstore(index, self.embeddings)
+        return self._vectorstores[index_name]
+    
+    def ingest_document(self, file_name, file, index_name, on_progress=None, session_id=None):
+        """Index a document without any UI, so it can run in a background job.
         
-        # Initialize LLM
-        self.llm = AzureChatOpenAI(
-            azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
-            api_key=Config.AZURE_OPENAI_KEY,
-            api_version="2024-02-01",
-            deployment_name=Config.DEPLOYMENT_NAME,
-        )
+        The file is a binary file object, read by the loader registered for
+        the file's extension (PDF, CSV, HTML or DOCX). For row-based formats
+        the pages count is the number of rows read. on_progress receives a
+        dict of pages read, chunks, embedded and uploaded counts and the
+        memory used so far as they change. Returns the same counts plus the
+        number of removed chunks and of unchanged chunks whose location was
+        updated, whether the index was created, the peak memory held and
+        the stage timings, which are also exported to the metrics file.
         
-        return self.pc, self.embeddings, self.llm
+        The document is streamed in page windows, so memory stays bounded
+        by the window and batch sizes rather than the file size. The memory
+        the job holds (an in-memory upload, and chunks and their vectors
+        until they are uploaded) is charged to session_id; ingestion fails
+        with MemoryLimitExceeded once that session's jobs together hold more
+        than INGESTION_MEMORY_LIMIT_MB.
+        """
+        doc_id = make_document_id(file_name)
+        trace = Trace(
+            "ingest",
+            sink=resources.get_metrics_sink(),
+            index_name=index_name,
+            doc_id=doc_id,
+            file_name=file_name
+        )
+        memory = resources.get_memory_budget().account(session_id)
+        try:
+            with memory:
+                # The upload itself counts when the session holds it in memory
+                memory.charge(_in_memory_size(file))
+                result = self._ingest_document(file_name, file, index_name, doc_id, trace, memory, on_progress)
+        except Exception as e:
+            trace.set(error=str(e))
+            raise
+        finally:
+            trace.set(peak_memory_mb=round(memory.peak_mb, 1))
+            timings = trace.finish()
+        return {
+            **result,
+            "peak_memory_mb": timings["peak_memory_mb"],
+            "seconds": timings["total_seconds"],
+            "stages": timings["stages"]
+        }
     
-    def process_pdf(self, uploaded_file, index_name):
-        """Process uploaded PDF and create vector store"""
-        # Save uploaded file to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            pdf_path = tmp_file.name
+    def _ingest_document(self, file_name, file, index_name, doc_id, trace, memory, on_progress):
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=Config.CHUNK_SIZE,
+            chunk_overlap=Config.CHUNK_OVERLAP,
+            length_function=len
+        )
+        # Every document lives in its own namespace so retrieval can be limited to a selection
+        namespace = doc_id
 
-        try:
-            # Read PDF with enhanced status
-            with st.status("📖 **Reading PDF Document...**", expanded=True) as status:
-                reader = PdfReader(pdf_path)
-                pages = [p.extract_text() or "" for p in reader.pages]
-                text = "\n".join(pages)
-
-                if not text.strip():
-                    raise ValueError("No text could be extracted from the PDF file.")
-                
-                status.update(label=f"✅ **PDF Read Successfully - {len(pages)} pages**", state="complete")
-
-            # Split text into chunks
-            with st.status("🔪 **Splitting Text into Chunks...**", expanded=True) as status:
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=Config.CHUNK_SIZE,
-                    chunk_overlap=Config.CHUNK_OVERLAP,
-                    length_function=len
+        previous_hashes = self.manifest.get_hashes(index_name, doc_id, namespace)
+        sparse_store = resources.get_sparse_index_store()
+        with trace.span("sparse_index"):
+            sparse_index = sparse_store.get(index_name, namespace)
+        context_builder = resources.get_context_builder()
+        progress = {"pages": 0, "chunks": 0, "embedded": 0, "upserted": 0, "memory_mb": 0.0}
+
+        def report(**counts):
+            progress.update(counts, memory_mb=round(memory.used_mb, 1))
+            if on_progress:
+                on_progress(dict(progress))
+
+        def prepare_index():
+            with trace.span("index_setup"):
+                return self.index_registry.prepare(index_name, Config.EMBEDDING_DIMENSION)
+
+        # Read, split and upload in a single streaming pass
+        with ThreadPoolExecutor(max_workers=1) as setup_executor:
+            # Index creation and readiness polling run alongside extraction and chunking
+            index_setup = setup_executor.submit(prepare_index)
+            index_handle = setup_executor.submit(lambda: index_setup.result()[0])
+
+            # Chunk ID -> hash of the metadata it is stored with
+            chunk_hashes = {}
+            # Chunks already stored whose location changed, e.g. after text was inserted above them
+            moved = {}
+            # Bytes held by each chunk sent for upload, oldest first
+            uploading = deque()
+            vector_bytes = Config.EMBEDDING_DIMENSION * _VECTOR_VALUE_BYTES
+
+            def new_chunks():
+                # Single streaming pass through the loader for this file type;
+                # each chunk carries its source, location and offsets
+                chunks = load_chunks(
+                    file_name,
+                    file,
+                    text_splitter,
+                    {"doc_id": doc_id, "source": file_name},
+                    trace
                 )
-                texts = text_splitter.split_text(text)
-                status.update(label=f"✅ **Created {len(texts)} Text Chunks**", state="complete")
-
-            # Test embedding
-            with st.status("🧠 **Testing Embeddings...**", expanded=True) as status:
-                vector = self.embeddings.embed_query(texts[0])
-                status.update(label=f"✅ **Vector Dimension: {len(vector)}**", state="complete")
-
-            # Create or connect to Pinecone index
-            with st.status("🗄️ **Setting Up Vector Database...**", expanded=True) as status:
-                if index_name not in self.pc.list_indexes().names():
-                    self.pc.create_index(
-                        name=index_name,
-                        dimension=Config.EMBEDDING_DIMENSION,  
-                        metric="cosine",
-                        spec=ServerlessSpec(
-                            cloud="aws",
-                            region="us-east-1"
-                        )
-                    )
-                    # Wait for index to be ready
-                    while not self.pc.describe_index(index_name).status['ready']:
-                        time.sleep(1)
-                    status.update(label=f"✅ **Created New Index: {index_name}**", state="complete")
-                else:
-                    status.update(label=f"✅ **Using Existing Index: {index_name}**", state="complete")
-
-            # Create documents from text chunks
-            with st.status("📄 **Creating Document Vectors...**", expanded=True) as status:
-                chunks = text_splitter.create_documents([text])
-                status.update(label=f"✅ **Prepared {len(chunks)} Documents**", state="complete")
-
-            # Upload documents to Pinecone
-            with st.status("🚀 **Uploading to Knowledge Base...**", expanded=True) as status:
-                vectorstore = PineconeVectorStore.from_documents(
-                    documents=chunks,
-                    index_name=index_name,
-                    embedding=self.embeddings
+                for chunk in trace.timed(chunks, "split"):
+                    # Identical chunks share an ID and are only stored once
+                    chunk_id = make_chunk_id(doc_id, chunk.page_content)
+                    report(pages=max(progress["pages"], chunk.metadata["page_end"]), chunks=len(chunk_hashes))
+                    if chunk_id in chunk_hashes:
+                        continue
+                    chunk_hashes[chunk_id] = make_metadata_hash(chunk.metadata)
+                    # The keyword index is built alongside the vector upload
+                    with trace.span("sparse_index"):
+                        sparse_index.add(chunk_id, chunk.page_content, chunk.metadata)
+                    if chunk_id not in previous_hashes:
+                        trace.increment(embedding_tokens=context_builder.count_tokens(chunk.page_content))
+                        # Stops the job before its session goes over the memory ceiling
+                        size = sys.getsizeof(chunk.page_content) + vector_bytes
+                        memory.charge(size)
+                        uploading.append(size)
+                        yield chunk_id, chunk
+                    elif previous_hashes[chunk_id] != chunk_hashes[chunk_id]:
+                        moved[chunk_id] = chunk.metadata
+
+            # Embed and upsert concurrently in batches
+            engine = IngestionEngine(
+                self.embeddings,
+                index_handle,
+                namespace=namespace,
+                embed_batch_size=Config.EMBED_BATCH_SIZE,
+                embed_concurrency=Config.EMBED_CONCURRENCY,
+                upsert_batch_size=Config.UPSERT_BATCH_SIZE,
+                upsert_concurrency=Config.UPSERT_CONCURRENCY,
+                max_retries=Config.RATE_LIMIT_MAX_RETRIES,
+                trace=trace
+            )
+            def upload_progress(embedded, upserted):
+                # Uploaded chunks no longer hold memory; batches mostly finish in the order they were sent
+                for _ in range(upserted - progress["upserted"]):
+                    memory.release(uploading.popleft())
+                report(chunks=len(chunk_hashes), embedded=embedded, upserted=upserted)
+
+            uploaded = engine.ingest(new_chunks(), on_progress=upload_progress)
+
+            if not chunk_hashes:
+                raise ValueError("No text could be extracted from the file.")
+
+            with trace.span("finalize"):
+                # Remove vectors for chunks that no longer exist in this document
+                stale_ids = previous_hashes.keys() - chunk_hashes.keys()
+                if stale_ids:
+                    engine.delete(sorted(stale_ids))
+                    sparse_index.remove(stale_ids)
+                # Unchanged chunks keep their vectors, but citations need their new pages and offsets
+                if moved:
+                    engine.update_metadata(moved)
+                sparse_store.save(index_name, namespace)
+                self.manifest.set(index_name, doc_id, chunk_hashes, namespace)
+                self.catalog.register(
+                    index_name,
+                    doc_id,
+                    name=file_name,
+                    namespace=namespace,
+                    pages=progress["pages"],
+                    chunks=len(chunk_hashes)
                 )
-                status.update(label="✅ **Knowledge Base Ready!**", state="complete")
+                
+                # Answers derived from the old contents of this document are no longer valid
+                if uploaded or stale_ids or moved:
+                    resources.get_answer_cache().invalidate(index_name, namespace)
             
-            return vectorstore
-        
-        finally:
-            # Clean up temporary file
-            os.unlink(pdf_path)
\ No newline at end of file
+            # Surfaces setup errors even when every chunk was already indexed
+            index, created = index_setup.result()
+            self.get_vectorstore(index_name, index)
+
+        report(chunks=len(chunk_hashes))
+        trace.count(
+            pages=progress["pages"],
+            chunks=len(chunk_hashes),
+            vectors_upserted=uploaded,
+            vectors_removed=len(stale_ids),
+            vectors_updated=len(moved)
+        )
+        return {
+            **progress,
+            "uploaded": uploaded,
+            "removed": len(stale_ids),
+            "updated": len(moved),
+            "created": created
+        }
+    
+    def process_document(self, uploaded_file, index_name, session_id=None):
+        """Process an uploaded document and create vector store"""
+        with st.status("📖 **Reading and Uploading Document...**", expanded=True) as status:
+            progress = st.empty()
+
+            def show_progress(counts):
+                progress.write(
+                    f"📄 {counts['pages']} pages read · 🔪 {counts['chunks']} chunks · "
+                    f"🧠 {counts['embedded']} embedded · 🚀 {counts['upserted']} uploaded · "
+                    f"💾 {counts['memory_mb']:.0f} MB held"
+                )
+
+            uploaded_file.seek(0)
+            result = self.ingest_document(
+                uploaded_file.name,
+                uploaded_file,
+                index_name,
+                on_progress=show_progress,
+                session_id=session_id
+            )
+            progress.write("⏱️ " + " · ".join(
+                f"{stage} {seconds:.2f}s" for stage, seconds in result["stages"].items()
+            ))
+            index_state = "new index" if result["created"] else "existing index"
+            status.update(
+                label=f"✅ **Knowledge Base Ready - {result['pages']} pages, {result['chunks']} chunks "
+                      f"({result['uploaded']} new, {result['removed']} removed) in {index_state} {index_name} "
+                      f"({result['seconds']:.1f}s, peak {result['peak_memory_mb']:.0f} MB)**",
+                state="complete"
+            )
+
+        return self.get_vectorstore(index_name)
\ No newline at end of file
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+class DiskLRUCache:
+    """Persistent key/value store backed by SQLite with size-bounded LRU eviction"""
+
+    # SQLite limits the number of bound parameters per statement
+    _BATCH_SIZE = 500
+
+    def __init__(self, path, max_entries):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached value for a key, or None on a miss"""
+        return self.get_many([key]).get(key)
+
+    def set(self, key, value):
+        """Store a single value"""
+        self.set_many({key: value})
+
+    def get_many(self, keys):
+        """Return a dict with the cached values for the keys that are present"""
+        found = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            for start in range(0, len(keys), self._BATCH_SIZE):
+                batch = keys[start:start + self._BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                found.update(rows)
+
+            # Touch hits so they are evicted last
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE cache SET accessed = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def set_many(self, items):
+        """Store several values and evict the least recently used entries over the limit"""
+        if not items:
+            return
+
+        with self._lock:
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, accessed) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()]
+            )
+            excess = self._count() - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                    (excess,)
+                )
+            self._conn.commit()
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._count()
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed embedding cache in front of another embeddings model"""
+
+    def __init__(self, embeddings, cache, namespace):
+        self.embeddings = embeddings
+        self.cache = cache
+        # Namespace keeps vectors from different models/deployments apart
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _pack(vector):
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(blob):
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        """Embed texts, only calling the wrapped model for texts not seen before"""
+        keys = [self._key(text) for text in texts]
+        cached = self.cache.get_many(list(set(keys)))
+
+        # Deduplicate misses so repeated chunks are embedded once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_entries = {key: self._pack(vector) for key, vector in zip(missing, vectors)}
+            self.cache.set_many(new_entries)
+            cached.update(new_entries)
+
+        return [self._unpack(cached[key]) for key in keys]
+
+    def embed_query(self, text):
+        """Embed a single query text through the cache"""
+        return self.embed_documents([text])[0]
+
+
+class QueryEmbeddingCache(Embeddings):
+    """In-memory LRU of question embeddings in front of another embeddings model.
+
+    Questions are keyed on their normalized text, so repeated questions,
+    including ones re-typed with different case or spacing, skip the
+    embedding request. Document embeddings pass straight through.
+    """
+
+    def __init__(self, embeddings, max_entries=1024):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text):
+        return " ".join(text.casefold().split())
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        key = self.normalize(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vector
\ No newline at end of file
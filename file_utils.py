@@ -0,0 +1,13 @@
+import json
+import os
+
+def atomic_write_json(path, data, indent=None):
+    """Write data as JSON to path, creating its directory if needed"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Write to a temp file first so a crash never leaves a truncated file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
\ No newline at end of file
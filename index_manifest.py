@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+from file_utils import atomic_write_json
+
+def make_document_id(file_name):
+    """Derive a stable document ID from an uploaded file name"""
+    stem, extension = os.path.splitext(os.path.basename(file_name).lower())
+    # Pinecone IDs must be ASCII, so keep the slug conservative
+    slug = re.sub(r"[^a-z0-9]+", "-", stem).strip("-") or "document"
+    # PDFs keep their original IDs; other types append the extension after a
+    # dot, which the slug never contains, so report.csv and report-csv.pdf differ
+    extension = re.sub(r"[^a-z0-9]+", "", extension)
+    if extension and extension != "pdf":
+        slug = f"{slug}.{extension}"
+    return slug
+
+def make_chunk_id(doc_id, text):
+    """Deterministic vector ID from the document ID and chunk content"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+    return f"{doc_id}#{digest}"
+
+def make_metadata_hash(metadata):
+    """Short hash of a chunk's metadata, to spot unchanged chunks that moved"""
+    encoded = json.dumps(metadata, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+class DocumentManifest:
+    """Records which chunk IDs are stored in each index for every document,
+    with a hash of the metadata each chunk was stored with"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self):
+        atomic_write_json(self.path, self._data)
+
+    @staticmethod
+    def _key(index_name, doc_id, namespace=None):
+        if namespace:
+            return f"{index_name}/{namespace}/{doc_id}"
+        return f"{index_name}/{doc_id}"
+
+    def get(self, index_name, doc_id, namespace=None):
+        """Return the set of chunk IDs currently indexed for a document"""
+        return set(self.get_hashes(index_name, doc_id, namespace))
+
+    def get_hashes(self, index_name, doc_id, namespace=None):
+        """Return {chunk_id: metadata hash} for a document"""
+        with self._lock:
+            entry = self._data.get(self._key(index_name, doc_id, namespace), [])
+            # Older manifests only list IDs; their metadata is treated as unknown
+            if isinstance(entry, list):
+                return dict.fromkeys(entry)
+            return dict(entry)
+
+    def set(self, index_name, doc_id, chunk_hashes, namespace=None):
+        """Replace the recorded chunks for a document, given as {chunk_id: metadata hash}"""
+        with self._lock:
+            self._data[self._key(index_name, doc_id, namespace)] = dict(sorted(chunk_hashes.items()))
+            self._save()
+
+    def remove(self, index_name, doc_id, namespace=None):
+        """Forget a document entirely"""
+        with self._lock:
+            if self._data.pop(self._key(index_name, doc_id, namespace), None) is not None:
+                self._save()
\ No newline at end of file
@@ -0,0 +1,86 @@
+import threading
+import time
+
+from pinecone import ServerlessSpec
+
+class IndexRegistry:
+    """Process-wide record of which Pinecone indexes exist, their dimension and readiness"""
+
+    # Shared by every instance so the knowledge survives Streamlit reruns
+    _dimensions = None
+    _ready = set()
+    _handles = {}
+    _lock = threading.Lock()
+
+    def __init__(self, pc, cloud="aws", region="us-east-1"):
+        self.pc = pc
+        self.cloud = cloud
+        self.region = region
+
+    def _refresh(self):
+        IndexRegistry._dimensions = {
+            description.name: int(description.dimension)
+            for description in self.pc.list_indexes()
+        }
+
+    def ensure_index(self, index_name, dimension):
+        """Create the index if needed and check its dimension; returns True if it was created"""
+        with IndexRegistry._lock:
+            if IndexRegistry._dimensions is None or index_name not in IndexRegistry._dimensions:
+                # Another process may have created it since the last listing
+                self._refresh()
+
+            if index_name in IndexRegistry._dimensions:
+                existing = IndexRegistry._dimensions[index_name]
+                if existing != dimension:
+                    raise ValueError(
+                        f"Index '{index_name}' has dimension {existing}, "
+                        f"but the embedding model produces {dimension}."
+                    )
+                return False
+
+            self.pc.create_index(
+                name=index_name,
+                dimension=dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud=self.cloud, region=self.region)
+            )
+            IndexRegistry._dimensions[index_name] = dimension
+            IndexRegistry._ready.discard(index_name)
+            return True
+
+    def wait_until_ready(self, index_name, timeout=300, initial_delay=0.5, max_delay=8.0):
+        """Poll the index status with exponential backoff until it is ready"""
+        if index_name in IndexRegistry._ready:
+            return
+
+        deadline = time.monotonic() + timeout
+        delay = initial_delay
+        while not self.pc.describe_index(index_name).status["ready"]:
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f"Index '{index_name}' was not ready after {timeout} seconds.")
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+        IndexRegistry._ready.add(index_name)
+
+    def get_index(self, index_name):
+        """Return a cached data-plane handle, avoiding a host lookup per upload"""
+        with IndexRegistry._lock:
+            if index_name not in IndexRegistry._handles:
+                IndexRegistry._handles[index_name] = self.pc.Index(index_name)
+            return IndexRegistry._handles[index_name]
+
+    def prepare(self, index_name, dimension):
+        """Ensure the index exists with the right dimension and is ready; returns (index, created)"""
+        created = self.ensure_index(index_name, dimension)
+        self.wait_until_ready(index_name)
+        return self.get_index(index_name), created
+
+    @classmethod
+    def forget(cls, index_name):
+        """Drop cached knowledge about an index, e.g. after it was deleted"""
+        with cls._lock:
+            if cls._dimensions is not None:
+                cls._dimensions.pop(index_name, None)
+            cls._ready.discard(index_name)
+            cls._handles.pop(index_name, None)
\ No newline at end of file
@@ -0,0 +1,224 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from tracing import Trace
+
+def _is_rate_limited(error):
+    """Detect HTTP 429 responses from the Azure OpenAI or Pinecone clients"""
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status == 429:
+        return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+def _retry_after(error):
+    """Return the server-suggested delay in seconds, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on rate limiting and recovers gradually"""
+
+    def __init__(self, max_concurrency, recovery_successes=10):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.recovery_successes = recovery_successes
+        self._active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def record_success(self):
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.recovery_successes and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def record_rate_limit(self):
+        with self._condition:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+
+    def call(self, func, max_retries, base_delay):
+        """Run func under the limit, backing off exponentially on 429 responses"""
+        for attempt in range(max_retries + 1):
+            with self:
+                try:
+                    result = func()
+                except Exception as e:
+                    if not _is_rate_limited(e) or attempt == max_retries:
+                        raise
+                    self.record_rate_limit()
+                    delay = _retry_after(e) or base_delay * (2 ** attempt)
+                else:
+                    self.record_success()
+                    return result
+            # Sleep outside the limiter so other requests can still drain
+            time.sleep(delay * random.uniform(1.0, 1.5))
+
+class IngestionEngine:
+    """Embeds and upserts chunks in concurrent batches with rate-limit-aware backpressure"""
+
+    def __init__(
+        self,
+        embeddings,
+        index,
+        namespace=None,
+        embed_batch_size=128,
+        embed_concurrency=4,
+        upsert_batch_size=100,
+        upsert_concurrency=4,
+        max_retries=6,
+        base_delay=1.0,
+        text_key="text",
+        trace=None
+    ):
+        self.embeddings = embeddings
+        self.index = index
+        self.namespace = namespace
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_concurrency = upsert_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.text_key = text_key
+        # Embed and upsert times are summed across concurrent batches
+        self.trace = trace if trace is not None else Trace("ingest")
+        self.embed_limiter = AdaptiveLimiter(embed_concurrency)
+        self.upsert_limiter = AdaptiveLimiter(upsert_concurrency)
+
+    def _embed_batch(self, batch):
+        texts = [chunk.page_content for _, chunk in batch]
+        with self.trace.span("embed"):
+            vectors = self.embed_limiter.call(
+                lambda: self.embeddings.embed_documents(texts),
+                self.max_retries,
+                self.base_delay
+            )
+        return [
+            (chunk_id, vector, {**chunk.metadata, self.text_key: chunk.page_content})
+            for (chunk_id, chunk), vector in zip(batch, vectors)
+        ]
+
+    def _resolve_index(self):
+        # The index may be a Future while it is still being created
+        if isinstance(self.index, Future):
+            return self.index.result()
+        return self.index
+
+    def _upsert_batch(self, vectors):
+        index = self._resolve_index()
+        with self.trace.span("upsert"):
+            self.upsert_limiter.call(
+                lambda: index.upsert(vectors=vectors, namespace=self.namespace),
+                self.max_retries,
+                self.base_delay
+            )
+        return len(vectors)
+
+    def ingest(self, items, on_progress=None):
+        """Embed and upsert (chunk_id, Document) pairs, returning the number of vectors written.
+
+        Items are consumed lazily, and reading stops while too many batches are
+        in flight, so a slow or rate-limited service throttles the producer.
+        """
+        stats = {"embedded": 0, "upserted": 0}
+        embed_pending = set()
+        upsert_pending = set()
+
+        with ThreadPoolExecutor(self.embed_concurrency) as embed_pool, \
+                ThreadPoolExecutor(self.upsert_concurrency) as upsert_pool:
+
+            def collect(done):
+                for future in done:
+                    if future in embed_pending:
+                        embed_pending.discard(future)
+                        vectors = future.result()
+                        stats["embedded"] += len(vectors)
+                        for start in range(0, len(vectors), self.upsert_batch_size):
+                            upsert_pending.add(
+                                upsert_pool.submit(self._upsert_batch, vectors[start:start + self.upsert_batch_size])
+                            )
+                    else:
+                        upsert_pending.discard(future)
+                        stats["upserted"] += future.result()
+                    if on_progress:
+                        on_progress(stats["embedded"], stats["upserted"])
+
+            def wait_until(condition):
+                while condition():
+                    done, _ = wait(embed_pending | upsert_pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+            def submit(batch):
+                # Backpressure: keep at most two batches queued per worker
+                wait_until(lambda: len(embed_pending) >= 2 * self.embed_concurrency
+                           or len(upsert_pending) >= 2 * self.upsert_concurrency)
+                embed_pending.add(embed_pool.submit(self._embed_batch, batch))
+
+            try:
+                batch = []
+                for item in items:
+                    batch.append(item)
+                    if len(batch) >= self.embed_batch_size:
+                        submit(batch)
+                        batch = []
+                if batch:
+                    submit(batch)
+                wait_until(lambda: embed_pending or upsert_pending)
+            except BaseException:
+                for future in embed_pending | upsert_pending:
+                    future.cancel()
+                raise
+
+        return stats["upserted"]
+
+    def update_metadata(self, metadata_by_id):
+        """Replace the metadata of stored vectors in place, without re-embedding them"""
+        index = self._resolve_index()
+
+        def update(item):
+            chunk_id, metadata = item
+            with self.trace.span("update"):
+                self.upsert_limiter.call(
+                    lambda: index.update(id=chunk_id, set_metadata=metadata, namespace=self.namespace),
+                    self.max_retries,
+                    self.base_delay
+                )
+
+        # Pinecone updates one vector per request, so run them concurrently
+        with ThreadPoolExecutor(self.upsert_concurrency) as pool:
+            list(pool.map(update, metadata_by_id.items()))
+
+    def delete(self, ids, batch_size=1000):
+        """Delete vectors by ID in batches the index accepts"""
+        index = self._resolve_index()
+        ids = list(ids)
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            with self.trace.span("delete"):
+                self.upsert_limiter.call(
+                    lambda: index.delete(ids=batch, namespace=self.namespace),
+                    self.max_retries,
+                    self.base_delay
+                )
\ No newline at end of file
@@ -0,0 +1,165 @@
+import copy
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from document_loaders import get_loader
+from file_utils import atomic_write_json
+from index_manifest import make_document_id
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class IngestionJobQueue:
+    """Runs document ingestion in background threads and persists job state.
+
+    Uploads are spooled to disk and job state is kept in a JSON file, so
+    jobs outlive the Streamlit session that submitted them and can be
+    polled from any session. Jobs that were queued or running when the
+    process stopped are resumed on start. Jobs for the same document run
+    one at a time; other jobs run concurrently up to max_workers.
+    """
+
+    def __init__(self, processor, directory, max_workers=2, save_interval=1.0, max_history=100):
+        self.processor = processor
+        self.directory = directory
+        self.path = os.path.join(directory, "jobs.json")
+        self.upload_dir = os.path.join(directory, "uploads")
+        self.save_interval = save_interval
+        self.max_history = max_history
+        self._lock = threading.Lock()
+        self._document_locks = {}
+        self._last_save = 0.0
+        self._jobs = self._load()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+
+        # Resume jobs interrupted by a restart, as long as their upload is still spooled
+        for job in sorted(self._jobs.values(), key=lambda job: job["created"]):
+            if job["state"] in (QUEUED, RUNNING):
+                if os.path.exists(self._upload_path(job)):
+                    job["state"] = QUEUED
+                    self._executor.submit(self._run, job["job_id"])
+                else:
+                    job["state"] = FAILED
+                    job["error"] = "Upload was lost before the job finished."
+        with self._lock:
+            self._save()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self):
+        atomic_write_json(self.path, self._jobs, indent=2)
+        self._last_save = time.monotonic()
+
+    def _upload_path(self, job):
+        # The spooled upload keeps the original extension; jobs from older versions were all PDFs
+        extension = os.path.splitext(job["file_name"])[1].lower() or ".pdf"
+        return os.path.join(self.upload_dir, f"{job['job_id']}{extension}")
+
+    def _update(self, job_id, force=True, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+            # Progress changes often; only state changes are written immediately
+            if force or time.monotonic() - self._last_save >= self.save_interval:
+                self._save()
+
+    def _prune(self):
+        finished = sorted(
+            (job for job in self._jobs.values() if job["state"] in (DONE, FAILED)),
+            key=lambda job: job["created"]
+        )
+        for job in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job["job_id"]]
+
+    def submit(self, file_name, file, index_name, session_id=None):
+        """Queue a document for ingestion and return the job ID.
+
+        The file is a binary file object, copied to the spool in blocks.
+        The job's memory counts against session_id's ceiling. Raises
+        ValueError for unsupported file types.
+        """
+        get_loader(file_name)
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "file_name": file_name,
+            "doc_id": make_document_id(file_name),
+            "index_name": index_name,
+            "session_id": session_id,
+            "state": QUEUED,
+            "progress": {"pages": 0, "chunks": 0, "embedded": 0, "upserted": 0, "memory_mb": 0.0},
+            "result": None,
+            "error": None,
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+        }
+        os.makedirs(self.upload_dir, exist_ok=True)
+        with open(self._upload_path(job), "wb") as f:
+            shutil.copyfileobj(file, f)
+
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+            self._save()
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def _document_lock(self, index_name, doc_id):
+        with self._lock:
+            return self._document_locks.setdefault((index_name, doc_id), threading.Lock())
+
+    def _run(self, job_id):
+        job = self.get(job_id)
+        # Re-uploads of the same document must not interleave their manifest updates
+        with self._document_lock(job["index_name"], job["doc_id"]):
+            self._update(job_id, state=RUNNING, started=time.time())
+            try:
+                self.processor.initialize_components()
+                # The loader streams from the spooled file instead of reading it all into memory
+                with open(self._upload_path(job), "rb") as f:
+                    result = self.processor.ingest_document(
+                        job["file_name"],
+                        f,
+                        job["index_name"],
+                        on_progress=lambda progress: self._update(job_id, force=False, progress=progress),
+                        session_id=job.get("session_id")
+                    )
+            except Exception as e:
+                self._update(job_id, state=FAILED, error=str(e), finished=time.time())
+            else:
+                self._update(job_id, state=DONE, result=result, finished=time.time())
+            finally:
+                try:
+                    os.remove(self._upload_path(job))
+                except OSError:
+                    pass
+
+    def get(self, job_id):
+        """Return a snapshot of a job, or None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def list(self, index_name=None, limit=10):
+        """Return the most recent jobs, optionally for one index"""
+        with self._lock:
+            jobs = [
+                copy.deepcopy(job) for job in self._jobs.values()
+                if index_name is None or job["index_name"] == index_name
+            ]
+        return sorted(jobs, key=lambda job: job["created"], reverse=True)[:limit]
+
+    def active(self, index_name=None):
+        """Return queued and running jobs"""
+        return [job for job in self.list(index_name, limit=None) if job["state"] in (QUEUED, RUNNING)]
\ No newline at end of file
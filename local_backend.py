@@ -0,0 +1,590 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.vectorstores import VectorStore
+
+from file_utils import atomic_write_json
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def _tokenize(text):
+    return _TOKEN_PATTERN.findall(text.lower())
+
+def _matches_filter(metadata, metadata_filter):
+    """Evaluate the subset of Pinecone's metadata filter language used by the app"""
+    if not metadata_filter:
+        return True
+    for key, condition in metadata_filter.items():
+        if key == "$and":
+            if not all(_matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(_matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$eq" and value != operand:
+                return False
+            if operator == "$ne" and value == operand:
+                return False
+            if operator == "$in" and value not in operand:
+                return False
+            if operator == "$nin" and value in operand:
+                return False
+    return True
+
+class _LocalNamespace:
+    """One namespace of a local index: a float32 matrix file plus an append-only row log.
+
+    With int8 quantization, a scalar-quantized copy of the matrix (one int8
+    code per value plus one float32 scale per row) is scanned instead,
+    using a quarter of the memory. The best candidates are then re-scored
+    exactly against the float32 rows, which are only read from disk for
+    those candidates. The gain is memory: codes are widened to float32 in
+    small blocks for the scan, so it runs about as fast as a float32 scan
+    of vectors already in memory, not faster.
+    """
+
+    # Rows widened to float32 per step when scanning int8 codes; small enough to stay in cache
+    SCAN_BLOCK_ROWS = 128
+    QUANTIZE_BLOCK_ROWS = 8192
+
+    def __init__(self, directory, dimension, quantization="none", rescore_factor=4):
+        os.makedirs(directory, exist_ok=True)
+        self.dimension = dimension
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.codes_path = os.path.join(directory, "codes.i8")
+        self.scales_path = os.path.join(directory, "scales.f32")
+        # Which vector writes the codes reflect, so writes made without quantization are noticed
+        self.codes_state_path = os.path.join(directory, "codes.json")
+        self.log_path = os.path.join(directory, "rows.jsonl")
+        # Number of vector writes in the row log; never decreases
+        self.writes = 0
+        self.ids = []
+        self.metadata = []
+        self.alive = []
+        self.id_to_row = {}
+        self._matrix = None
+        self._codes = None
+        self._scales = None
+        self._load()
+        if self.quantization == "int8":
+            self._ensure_codes()
+
+    def _load(self):
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if "delete" in record:
+                    row = self.id_to_row.pop(record["delete"], None)
+                    if row is not None:
+                        self.alive[row] = False
+                    continue
+                row = record["row"]
+                if not record.get("metadata_only"):
+                    self.writes += 1
+                if row == len(self.ids):
+                    self.ids.append(record["id"])
+                    self.metadata.append(record["metadata"])
+                    self.alive.append(True)
+                else:
+                    self.metadata[row] = record["metadata"]
+                    self.alive[row] = True
+                self.id_to_row[record["id"]] = row
+
+    @staticmethod
+    def _quantize(vectors):
+        # Symmetric per-row scale: the largest component maps to +-127
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _codes_state(self):
+        return {"rows": len(self.ids), "writes": self.writes}
+
+    def _ensure_codes(self):
+        # Rebuild the codes when missing or stale, e.g. after vectors were written without quantization
+        rows = len(self.ids)
+        if os.path.exists(self.codes_state_path):
+            with open(self.codes_state_path, "r", encoding="utf-8") as f:
+                fresh = json.load(f) == self._codes_state()
+            if fresh and os.path.getsize(self.codes_path) == rows * self.dimension \
+                    and os.path.getsize(self.scales_path) == rows * 4:
+                return
+        with open(self.codes_path, "wb") as codes_file, open(self.scales_path, "wb") as scales_file:
+            matrix = self.matrix()
+            for start in range(0, rows, self.QUANTIZE_BLOCK_ROWS):
+                codes, scales = self._quantize(np.asarray(matrix[start:start + self.QUANTIZE_BLOCK_ROWS]))
+                codes_file.write(codes.tobytes())
+                scales_file.write(scales.tobytes())
+        atomic_write_json(self.codes_state_path, self._codes_state())
+        self._codes = self._scales = None
+
+    def matrix(self):
+        """Memory-mapped view of all rows, including deleted ones"""
+        if self._matrix is None and self.ids:
+            self._matrix = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self.ids), self.dimension)
+            )
+        return self._matrix
+
+    def quantized(self):
+        """Contiguous in-memory int8 codes and per-row scales"""
+        if self._codes is None and self.ids:
+            self._codes = np.fromfile(self.codes_path, dtype=np.int8).reshape(len(self.ids), self.dimension)
+            self._scales = np.fromfile(self.scales_path, dtype=np.float32)
+        return self._codes, self._scales
+
+    def memory_bytes(self):
+        """Bytes held in memory for scanning this namespace"""
+        if self.quantization == "int8":
+            return len(self.ids) * (self.dimension + 4)
+        return len(self.ids) * self.dimension * 4
+
+    def upsert(self, vectors):
+        # Stored vectors are unit length, so a dot product is the cosine similarity
+        records = []
+        appended = []
+        overwritten = []
+        # An ID repeated within the batch keeps its last vector, as in Pinecone
+        latest = {vector_id: (vector_id, values, metadata) for vector_id, values, metadata in vectors}
+        for vector_id, values, metadata in latest.values():
+            vector = np.asarray(values, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector = vector / norm
+
+            row = self.id_to_row.get(vector_id)
+            if row is None:
+                row = len(self.ids) + len(appended)
+                appended.append(vector)
+            else:
+                # Overwrite in place
+                self._matrix = None
+                overwritten.append((row, vector))
+                with open(self.vectors_path, "r+b") as f:
+                    f.seek(row * self.dimension * 4)
+                    f.write(vector.tobytes())
+            records.append({"row": row, "id": vector_id, "metadata": metadata or {}})
+
+        if appended:
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(appended).tobytes())
+        if self.quantization == "int8":
+            self._write_codes(appended, overwritten)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+        for record in records:
+            row = record["row"]
+            if row == len(self.ids):
+                self.ids.append(record["id"])
+                self.metadata.append(record["metadata"])
+                self.alive.append(True)
+            else:
+                self.metadata[row] = record["metadata"]
+                self.alive[row] = True
+            self.id_to_row[record["id"]] = row
+        self.writes += len(records)
+        self._matrix = None
+        if self.quantization == "int8":
+            # Recorded after the log, so a crash in between only costs a rebuild
+            atomic_write_json(self.codes_state_path, self._codes_state())
+
+    def _write_codes(self, appended, overwritten):
+        if appended:
+            codes, scales = self._quantize(np.stack(appended))
+            with open(self.codes_path, "ab") as f:
+                f.write(codes.tobytes())
+            with open(self.scales_path, "ab") as f:
+                f.write(scales.tobytes())
+        if overwritten:
+            codes, scales = self._quantize(np.stack([vector for _, vector in overwritten]))
+            with open(self.codes_path, "r+b") as codes_file, open(self.scales_path, "r+b") as scales_file:
+                for (row, _), row_codes, scale in zip(overwritten, codes, scales):
+                    codes_file.seek(row * self.dimension)
+                    codes_file.write(row_codes.tobytes())
+                    scales_file.seek(row * 4)
+                    scales_file.write(scale.tobytes())
+        self._codes = self._scales = None
+
+    def update_metadata(self, vector_id, metadata):
+        # Merged like Pinecone's set_metadata; the log replay keeps the latest record per row
+        row = self.id_to_row.get(vector_id)
+        if row is None:
+            return
+        self.metadata[row] = {**self.metadata[row], **metadata}
+        record = {"row": row, "id": vector_id, "metadata": self.metadata[row], "metadata_only": True}
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def delete(self, ids):
+        deleted = [vector_id for vector_id in ids if vector_id in self.id_to_row]
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            for vector_id in deleted:
+                self.alive[self.id_to_row.pop(vector_id)] = False
+                f.write(json.dumps({"delete": vector_id}) + "\n")
+
+    def _approximate_scores(self, query, rows):
+        """Scores of the given rows from their int8 codes"""
+        codes, scales = self.quantized()
+        # Deleted and filtered-out rows are never widened
+        every_row = len(rows) == len(codes)
+        scores = np.empty(len(rows), dtype=np.float32)
+        buffer = np.empty((self.SCAN_BLOCK_ROWS, self.dimension), dtype=np.float32)
+        for start in range(0, len(rows), self.SCAN_BLOCK_ROWS):
+            stop = min(start + self.SCAN_BLOCK_ROWS, len(rows))
+            block = codes[start:stop] if every_row else codes[rows[start:stop]]
+            buffer[:stop - start] = block
+            np.dot(buffer[:stop - start], query, out=scores[start:stop])
+        return scores * (scales if every_row else scales[rows])
+
+    def query(self, vector, top_k, metadata_filter=None, include_values=False):
+        matrix = self.matrix()
+        if matrix is None:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        mask = np.asarray(self.alive, dtype=bool)
+        if metadata_filter:
+            mask &= np.fromiter(
+                (_matches_filter(metadata, metadata_filter) for metadata in self.metadata),
+                dtype=bool,
+                count=len(self.metadata)
+            )
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return []
+
+        if self.quantization == "int8":
+            # Shortlist on the int8 codes, then re-score the shortlist exactly
+            approximate = self._approximate_scores(query, candidates)
+            shortlist = min(top_k * self.rescore_factor, candidates.size)
+            keep = np.argpartition(-approximate, shortlist - 1)[:shortlist]
+            candidates = np.sort(candidates[keep])
+            candidate_scores = matrix[candidates] @ query
+        else:
+            # Vectorized cosine scores over the whole namespace
+            candidate_scores = (matrix @ query)[candidates]
+
+        k = min(top_k, candidates.size)
+        top = np.argpartition(-candidate_scores, k - 1)[:k]
+        top = top[np.argsort(-candidate_scores[top])]
+
+        matches = []
+        for position in top:
+            row = int(candidates[position])
+            match = {
+                "id": self.ids[row],
+                "score": float(candidate_scores[position]),
+                "metadata": self.metadata[row],
+            }
+            if include_values:
+                match["values"] = matrix[row].tolist()
+            matches.append(match)
+        return matches
+
+    def __len__(self):
+        return len(self.id_to_row)
+
+class LocalVectorIndex:
+    """On-disk vector index with the subset of Pinecone's Index API used by the app"""
+
+    def __init__(self, directory, dimension, latency=0.0, quantization="none"):
+        self.directory = directory
+        self.dimension = dimension
+        # Simulated network round trip per request, for benchmarks
+        self.latency = latency
+        self.quantization = quantization
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace):
+        name = namespace or "__default__"
+        if name not in self._namespaces:
+            self._namespaces[name] = _LocalNamespace(
+                os.path.join(self.directory, name),
+                self.dimension,
+                quantization=self.quantization
+            )
+        return self._namespaces[name]
+
+    def upsert(self, vectors, namespace=None):
+        time.sleep(self.latency)
+        with self._lock:
+            self._namespace(namespace).upsert(vectors)
+        return {"upserted_count": len(vectors)}
+
+    def update(self, id, set_metadata=None, namespace=None):
+        time.sleep(self.latency)
+        with self._lock:
+            self._namespace(namespace).update_metadata(id, set_metadata or {})
+
+    def delete(self, ids, namespace=None):
+        time.sleep(self.latency)
+        with self._lock:
+            self._namespace(namespace).delete(ids)
+
+    def query(self, vector, top_k, namespace=None, filter=None, include_metadata=True, include_values=False):
+        time.sleep(self.latency)
+        with self._lock:
+            matches = self._namespace(namespace).query(vector, top_k, filter, include_values)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def describe_index_stats(self):
+        with self._lock:
+            namespaces = {
+                name: {
+                    "vector_count": len(self._namespace(name)),
+                    "memory_bytes": self._namespace(name).memory_bytes(),
+                }
+                for name in sorted(os.listdir(self.directory))
+                if os.path.isdir(os.path.join(self.directory, name))
+            }
+        return {"dimension": self.dimension, "namespaces": namespaces}
+
+class _LocalIndexDescription:
+    def __init__(self, name, dimension):
+        self.name = name
+        self.dimension = dimension
+        self.status = {"ready": True}
+
+class LocalVectorClient:
+    """Stand-in for the Pinecone client that manages LocalVectorIndex directories"""
+
+    def __init__(self, directory, latency=0.0, quantization="none"):
+        self.directory = directory
+        self.latency = latency
+        self.quantization = quantization
+        self._indexes = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _config_path(self, name):
+        return os.path.join(self.directory, name, "index.json")
+
+    def list_indexes(self):
+        descriptions = []
+        for name in sorted(os.listdir(self.directory)):
+            if os.path.exists(self._config_path(name)):
+                descriptions.append(self.describe_index(name))
+        return descriptions
+
+    def create_index(self, name, dimension, metric="cosine", spec=None):
+        os.makedirs(os.path.join(self.directory, name), exist_ok=True)
+        with open(self._config_path(name), "w", encoding="utf-8") as f:
+            json.dump({"dimension": dimension, "metric": metric}, f)
+
+    def describe_index(self, name):
+        with open(self._config_path(name), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        return _LocalIndexDescription(name, config["dimension"])
+
+    def Index(self, name):
+        with self._lock:
+            if name not in self._indexes:
+                dimension = self.describe_index(name).dimension
+                self._indexes[name] = LocalVectorIndex(
+                    os.path.join(self.directory, name),
+                    dimension,
+                    latency=self.latency,
+                    quantization=self.quantization
+                )
+            return self._indexes[name]
+
+class LocalVectorStore(VectorStore):
+    """LangChain vector store over a LocalVectorIndex, mirroring PineconeVectorStore"""
+
+    def __init__(self, index, embedding, namespace=None, text_key="text"):
+        self._index = index
+        self._embedding = embedding
+        self._namespace = namespace
+        self._text_key = text_key
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def add_texts(self, texts, metadatas=None, ids=None, namespace=None, **kwargs):
+        texts = list(texts)
+        ids = list(ids) if ids is not None else [
+            hashlib.sha256(text.encode("utf-8")).hexdigest()[:32] for text in texts
+        ]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        self._index.upsert(
+            vectors=[
+                (vector_id, vector, {**metadata, self._text_key: text})
+                for vector_id, vector, metadata, text in zip(ids, vectors, metadatas, texts)
+            ],
+            namespace=namespace or self._namespace
+        )
+        return ids
+
+    def delete(self, ids=None, namespace=None, **kwargs):
+        if ids:
+            self._index.delete(ids=ids, namespace=namespace or self._namespace)
+        return True
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None, namespace=None):
+        response = self._index.query(
+            vector=embedding,
+            top_k=k,
+            namespace=namespace or self._namespace,
+            filter=filter,
+            include_metadata=True
+        )
+        results = []
+        for match in response["matches"]:
+            metadata = dict(match["metadata"])
+            text = metadata.pop(self._text_key, "")
+            results.append((Document(id=match["id"], page_content=text, metadata=metadata), match["score"]))
+        return results
+
+    def similarity_search_with_score(self, query, k=4, filter=None, namespace=None):
+        return self.similarity_search_by_vector_with_score(
+            self._embedding.embed_query(query),
+            k=k,
+            filter=filter,
+            namespace=namespace
+        )
+
+    def similarity_search(self, query, k=4, filter=None, namespace=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter, namespace)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] mapped to [0, 1]
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, index=None, namespace=None, **kwargs):
+        store = cls(index, embedding, namespace=namespace)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic feature-hashing embeddings for offline runs and benchmarks"""
+
+    def __init__(self, dimension, latency=0.0):
+        self.dimension = dimension
+        # Simulated network round trip per request, for benchmarks
+        self.latency = latency
+
+    def _bucket(self, token):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dimension, 1.0 if value >> 63 else -1.0
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        tokens = _tokenize(text)
+        # Unigrams plus bigrams give some sensitivity to phrasing
+        for token in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            bucket, sign = self._bucket(token)
+            vector[bucket] += sign
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return self._embed(text)
+
+class LocalChatModel(BaseChatModel):
+    """Deterministic extractive chat model standing in for Azure OpenAI offline.
+
+    For RAG prompts it answers with the context sentences that share the most
+    words with the question, and summaries keep the leading sentences of each
+    passage; other prompts get a fixed reply.
+    """
+
+    max_sentences: int = 3
+    # Simulated time to first token and per generated token, for benchmarks
+    latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "intellidoc-local"
+
+    def _answer(self, messages):
+        prompt = messages[-1].content if messages else ""
+        previous_questions = re.findall(r"^\s*User: (.+)$", prompt, re.MULTILINE)
+        if "Follow-up question:" in prompt:
+            # Carry the last question's terms over into the follow-up
+            follow_up = prompt.rsplit("Follow-up question:", 1)[1].split("Standalone question:", 1)[0].strip()
+            return f"{follow_up} {previous_questions[-1]}" if previous_questions else follow_up
+        if "Conversation to summarize:" in prompt:
+            summary = prompt.split("Current summary:", 1)[1].split("Conversation to summarize:", 1)[0].strip()
+            earlier = [] if summary == "(none)" else [summary]
+            return " ".join(earlier + [f"Asked: {question}" for question in previous_questions])
+        if "Text to summarize:" in prompt or "Reports to compare:" in prompt:
+            # Extractive summary: the leading sentences of each passage
+            text = re.split(r"Text to summarize:|Reports to compare:", prompt, 1)[1]
+            text = re.split(r"\n\s*(?:Summary|Comparison): ", text, 1)[0]
+            passages = [passage for passage in re.split(r"\n\s*\n", text) if passage.strip()]
+            leads = []
+            for passage in passages:
+                sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", passage) if s.strip()]
+                leads.extend(sentences[:max(1, self.max_sentences // len(passages))])
+            return " ".join(leads)
+        if "Context:" not in prompt or "Question:" not in prompt:
+            return "The local model can only answer questions about indexed documents."
+
+        context = prompt.split("Context:", 1)[1].rsplit("Question:", 1)[0]
+        question = prompt.rsplit("Question:", 1)[1].split("Answer:", 1)[0]
+        question_tokens = set(_tokenize(question))
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", context) if s.strip()]
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (-len(question_tokens & set(_tokenize(sentences[i]))), i)
+        )
+        best = [sentences[i] for i in sorted(ranked[:self.max_sentences])
+                if question_tokens & set(_tokenize(sentences[i]))]
+        return " ".join(best) if best else "I don't know."
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        answer = self._answer(messages)
+        time.sleep(self.latency + self.token_latency * len(re.findall(r"\S+\s*", answer)))
+        message = AIMessage(content=answer)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for token in re.findall(r"\S+\s*", self._answer(messages)):
+            time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
\ No newline at end of file
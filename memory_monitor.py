@@ -0,0 +1,78 @@
+import threading
+
+class MemoryLimitExceeded(MemoryError):
+    """Raised when a session's ingestion jobs hold more than its memory ceiling"""
+
+class MemoryBudget:
+    """Per-session ceiling on the memory held by ingestion jobs.
+
+    Jobs charge the bytes they buffer (in-memory uploads, and chunks with
+    their vectors until they are uploaded) to the session that submitted
+    them. A session that goes over the limit fails its own job; jobs from
+    other sessions running in the same process are unaffected.
+    """
+
+    def __init__(self, limit_mb=None):
+        self.limit_bytes = limit_mb * 1024 * 1024 if limit_mb else None
+        self._used = {}
+        self._lock = threading.Lock()
+
+    def account(self, session_id):
+        """Start accounting for one job of a session"""
+        return JobMemory(self, session_id)
+
+    def used_mb(self, session_id):
+        with self._lock:
+            return self._used.get(session_id, 0) / (1024 * 1024)
+
+    def _charge(self, session_id, nbytes):
+        with self._lock:
+            used = self._used.get(session_id, 0) + nbytes
+            if nbytes > 0 and self.limit_bytes and used > self.limit_bytes:
+                raise MemoryLimitExceeded(
+                    f"Processing needs more than this session's {self.limit_bytes // (1024 * 1024)} MB "
+                    f"memory limit (INGESTION_MEMORY_LIMIT_MB). Wait for other uploads to finish, "
+                    f"split the document or raise the limit."
+                )
+            if used > 0:
+                self._used[session_id] = used
+            else:
+                self._used.pop(session_id, None)
+
+class JobMemory:
+    """Bytes held by one ingestion job, charged to its session's budget"""
+
+    def __init__(self, budget, session_id):
+        self.budget = budget
+        self.session_id = session_id
+        self.used = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Whatever the job still holds is freed with it
+        self.release(self.used)
+
+    def charge(self, nbytes):
+        """Add buffered bytes, raising MemoryLimitExceeded if the session would go over its limit"""
+        with self._lock:
+            self.budget._charge(self.session_id, nbytes)
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+
+    def release(self, nbytes):
+        with self._lock:
+            nbytes = min(nbytes, self.used)
+            self.budget._charge(self.session_id, -nbytes)
+            self.used -= nbytes
+
+    @property
+    def used_mb(self):
+        return self.used / (1024 * 1024)
+
+    @property
+    def peak_mb(self):
+        return self.peak / (1024 * 1024)
\ No newline at end of file
@@ -0,0 +1,76 @@
+import io
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from PyPDF2 import PdfReader
+
+# Each worker process opens the PDF once and keeps the reader around
+_worker_reader = None
+
+def _open_reader(source):
+    return PdfReader(source if isinstance(source, str) else io.BytesIO(source))
+
+def _init_worker(source):
+    global _worker_reader
+    # Workers receive a path rather than a pickled copy of the document
+    _worker_reader = _open_reader(source)
+
+def _extract_window(reader, page_range):
+    start, stop = page_range
+    return [
+        (page_index + 1, reader.pages[page_index].extract_text() or "")
+        for page_index in range(start, stop)
+    ]
+
+def _extract_page_range(page_range):
+    return _extract_window(_worker_reader, page_range)
+
+def iter_pdf_pages(source, max_workers=None, pages_per_task=8, max_pending=None):
+    """Yield (page_number, text) tuples in page order from a PDF file path or bytes.
+
+    Pages are extracted in windows of pages_per_task. At most max_pending
+    windows (by default two per worker) are extracted ahead of the caller,
+    so extracted text waiting to be chunked stays bounded however long the
+    document is and however slowly the caller embeds and uploads.
+    """
+    reader = _open_reader(source)
+    page_count = len(reader.pages)
+    page_ranges = [
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+    # Small documents are not worth the process pool start-up cost
+    if max_workers == 1 or page_count <= pages_per_task:
+        for page_range in page_ranges:
+            yield from _extract_window(reader, page_range)
+        return
+    # Workers parse the document themselves
+    del reader
+
+    workers = max_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    # Ingestion runs on a worker thread of a multi-threaded server, where forking
+    # can deadlock on locks held by other threads; start workers fresh instead
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=_init_worker,
+        initargs=(source,)
+    ) as executor:
+        # Later windows are extracted while the caller is still chunking and
+        # uploading earlier ones, but never more than max_pending ahead
+        remaining = iter(page_ranges)
+        pending = deque(
+            executor.submit(_extract_page_range, page_range)
+            for _, page_range in zip(range(max_pending), remaining)
+        )
+        while pending:
+            pages = pending.popleft().result()
+            next_range = next(remaining, None)
+            if next_range is not None:
+                pending.append(executor.submit(_extract_page_range, next_range))
+            yield from pages
\ No newline at end of file
@@ -0,0 +1,176 @@
+import functools
+import os
+
+import httpx
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from langchain_pinecone import Pinecone as PineconeVectorStore
+from pinecone import Pinecone
+
+from answer_cache import SemanticAnswerCache
+from config import Config
+from context_builder import ContextBuilder
+from embedding_cache import CachedEmbeddings, DiskLRUCache, QueryEmbeddingCache
+from local_backend import (
+    HashingEmbeddings,
+    LocalChatModel,
+    LocalVectorClient,
+    LocalVectorIndex,
+    LocalVectorStore,
+)
+from memory_monitor import MemoryBudget
+from sparse_index import SparseIndexStore
+from summarization import DocumentSummarizer
+from tracing import MetricsSink
+
+# Process-wide clients shared by every Streamlit session and rerun. These use
+# functools.lru_cache rather than st.cache_resource so headless entry points
+# can share them without a Streamlit runtime.
+
+@functools.lru_cache(maxsize=None)
+def get_http_client():
+    """Shared HTTP connection pool for all Azure OpenAI requests"""
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=Config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.HTTP_MAX_CONNECTIONS
+        ),
+        timeout=httpx.Timeout(Config.HTTP_TIMEOUT)
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_pinecone_client():
+    """Shared Pinecone client, or its local stand-in"""
+    Config.validate_environment()
+    if Config.BACKEND == "local":
+        return LocalVectorClient(
+            Config.LOCAL_INDEX_DIR,
+            latency=Config.LOCAL_VECTOR_LATENCY,
+            quantization=Config.LOCAL_INDEX_QUANTIZATION
+        )
+    return Pinecone(api_key=Config.PINECONE_API_KEY)
+
+@functools.lru_cache(maxsize=None)
+def get_embeddings():
+    """Shared Azure embeddings behind the on-disk embedding cache and in-memory query cache"""
+    Config.validate_environment()
+    if Config.BACKEND == "local":
+        return QueryEmbeddingCache(
+            HashingEmbeddings(Config.EMBEDDING_DIMENSION, latency=Config.LOCAL_EMBED_LATENCY),
+            Config.QUERY_EMBEDDING_CACHE_SIZE
+        )
+    
+    # Shortened vectors are requested only when configured, keeping the default request unchanged
+    shortened = {} if Config.EMBEDDING_DIMENSION == 1536 else {"dimensions": Config.EMBEDDING_DIMENSION}
+    azure_embeddings = AzureOpenAIEmbeddings(
+        deployment=Config.EMBEDDING_DEPLOYMENT,
+        model=Config.EMBEDDING_MODEL,
+        openai_api_type="azure",
+        openai_api_key=Config.AZURE_OPENAI_KEY,
+        azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+        openai_api_version="2023-05-15",
+        chunk_size=2048,
+        http_client=get_http_client(),
+        **shortened
+    )
+    
+    # Serve previously embedded chunks from the on-disk cache
+    namespace = f"{Config.EMBEDDING_MODEL}:{Config.EMBEDDING_DEPLOYMENT}"
+    if shortened:
+        namespace += f":{Config.EMBEDDING_DIMENSION}"
+    # Repeated questions are answered from memory without touching the disk cache
+    return QueryEmbeddingCache(
+        CachedEmbeddings(
+            azure_embeddings,
+            DiskLRUCache(
+                os.path.join(Config.CACHE_DIR, "embeddings.sqlite3"),
+                Config.EMBEDDING_CACHE_MAX_ENTRIES
+            ),
+            namespace=namespace
+        ),
+        Config.QUERY_EMBEDDING_CACHE_SIZE
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_llm():
+    """Shared Azure chat model"""
+    Config.validate_environment()
+    if Config.BACKEND == "local":
+        return LocalChatModel(latency=Config.LOCAL_LLM_LATENCY, token_latency=Config.LOCAL_LLM_TOKEN_LATENCY)
+    return AzureChatOpenAI(
+        azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+        api_key=Config.AZURE_OPENAI_KEY,
+        api_version="2024-02-01",
+        deployment_name=Config.DEPLOYMENT_NAME,
+        http_client=get_http_client()
+    )
+
+def create_vectorstore(index, embeddings, namespace=None):
+    """Wrap an index handle from get_pinecone_client() in the matching LangChain store"""
+    if isinstance(index, LocalVectorIndex):
+        return LocalVectorStore(index, embeddings, namespace=namespace)
+    return PineconeVectorStore(index=index, embedding=embeddings, namespace=namespace)
+
+@functools.lru_cache(maxsize=None)
+def get_sparse_index_store():
+    """Shared local BM25 indexes, one per index and namespace"""
+    return SparseIndexStore(Config.SPARSE_INDEX_DIR)
+
+@functools.lru_cache(maxsize=None)
+def get_context_builder():
+    """Shared token-budgeted context packer"""
+    return ContextBuilder(
+        Config.CONTEXT_TOKEN_BUDGET,
+        encoding_name=Config.TOKEN_ENCODING,
+        min_relative_score=Config.CONTEXT_MIN_RELATIVE_SCORE
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_answer_cache():
+    """Shared semantic answer cache"""
+    return SemanticAnswerCache(
+        threshold=Config.ANSWER_CACHE_THRESHOLD,
+        ttl_seconds=Config.ANSWER_CACHE_TTL_SECONDS,
+        max_entries=Config.ANSWER_CACHE_MAX_ENTRIES
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_memory_budget():
+    """Shared per-session memory ceiling for ingestion jobs"""
+    return MemoryBudget(Config.INGESTION_MEMORY_LIMIT_MB)
+
+@functools.lru_cache(maxsize=None)
+def get_metrics_sink():
+    """Shared metrics file for stage timings, or None when metrics are disabled"""
+    if not Config.METRICS_ENABLED:
+        return None
+    return MetricsSink(Config.METRICS_PATH)
+
+@functools.lru_cache(maxsize=None)
+def get_summarizer():
+    """Shared map-reduce summarizer behind the on-disk summary cache"""
+    return DocumentSummarizer(
+        get_llm(),
+        DiskLRUCache(
+            os.path.join(Config.CACHE_DIR, "summaries.sqlite3"),
+            Config.SUMMARY_CACHE_MAX_ENTRIES
+        ),
+        cache_namespace=f"{Config.BACKEND}:{Config.DEPLOYMENT_NAME}",
+        sparse_store=get_sparse_index_store(),
+        context_builder=get_context_builder(),
+        max_workers=Config.SUMMARY_CONCURRENCY,
+        reduce_token_budget=Config.SUMMARY_REDUCE_TOKEN_BUDGET,
+        summary_words=Config.SUMMARY_WORDS
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_document_processor():
+    """Shared document processor, so the manifest has a single writer per process"""
+    from document_processor import DocumentProcessor
+    return DocumentProcessor()
+
+
+@functools.lru_cache(maxsize=None)
+def get_ingestion_queue():
+    """Shared background ingestion queue, so jobs survive reruns and page refreshes"""
+    from ingestion_jobs import IngestionJobQueue
+    return IngestionJobQueue(get_document_processor(), Config.JOBS_DIR, max_workers=Config.INGESTION_WORKERS)
\ No newline at end of file
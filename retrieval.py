@@ -0,0 +1,211 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from index_manifest import make_chunk_id
+
+def mmr_select(relevance, vectors, k, lambda_mult=0.7):
+    """Return the positions of k candidates picked by maximal marginal relevance.
+
+    Each pick maximizes lambda_mult * relevance minus (1 - lambda_mult) times
+    the highest (non-negative) cosine similarity to an earlier pick. Pairwise
+    similarities are computed once as a matrix product; candidates with a
+    zero vector are never considered redundant.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    similarity = unit @ unit.T
+
+    redundancy = np.zeros(len(relevance), dtype=np.float32)
+    available = np.ones(len(relevance), dtype=bool)
+    selected = []
+    for _ in range(min(k, len(relevance))):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
+
+def normalize_scores(scores):
+    """Min-max normalize a dict of scores to [0, 1]"""
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    if high == low:
+        return {key: 1.0 for key in scores}
+    return {key: (score - low) / (high - low) for key, score in scores.items()}
+
+class NamespaceRetriever(BaseRetriever):
+    """Retrieves the top-k chunks across a selected set of namespaces.
+
+    The question is embedded once and every namespace is searched in
+    parallel, so cost scales with the selected documents rather than with
+    everything stored in the index. With mmr_lambda set, fetch_k candidates
+    are fetched along with their stored vectors and reranked locally for
+    relevance and diversity, so near-duplicate chunks do not crowd out the
+    rest of the context.
+    """
+
+    vectorstore: Any
+    namespaces: List[str]
+    k: int = 3
+    fetch_k: int = 12
+    mmr_lambda: Optional[float] = None
+
+    def search_with_vectors(self, query_vector, k):
+        """Return (document, score, vector) triples for the best k chunks across namespaces"""
+        # PineconeVectorStore and LocalVectorStore keep the raw index and text key under the same names
+        index = self.vectorstore._index
+        text_key = self.vectorstore._text_key
+
+        def search(namespace):
+            response = index.query(
+                vector=query_vector,
+                top_k=k,
+                namespace=namespace,
+                include_metadata=True,
+                include_values=True
+            )
+            results = []
+            for match in response["matches"]:
+                metadata = dict(match["metadata"])
+                text = metadata.pop(text_key, "")
+                document = Document(id=match["id"], page_content=text, metadata=metadata)
+                results.append((document, match["score"], match["values"]))
+            return results
+
+        if len(self.namespaces) == 1:
+            results = search(self.namespaces[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(8, len(self.namespaces))) as executor:
+                results = [match for matches in executor.map(search, self.namespaces) for match in matches]
+        return sorted(results, key=lambda match: match[1], reverse=True)[:k]
+
+    def search_with_scores(self, query_vector, k):
+        """Return (document, score) pairs for the best k chunks across namespaces"""
+        def search(namespace):
+            return self.vectorstore.similarity_search_by_vector_with_score(
+                query_vector,
+                k=k,
+                namespace=namespace
+            )
+
+        if len(self.namespaces) == 1:
+            results = search(self.namespaces[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(8, len(self.namespaces))) as executor:
+                results = [match for matches in executor.map(search, self.namespaces) for match in matches]
+        return sorted(results, key=lambda match: match[1], reverse=True)[:k]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        if not self.namespaces:
+            return []
+        return self.retrieve_by_vector(query, self.vectorstore.embeddings.embed_query(query))
+
+    def retrieve_by_vector(self, query, query_vector):
+        """Retrieve for a question whose embedding was already computed, e.g. in a batch"""
+        if not self.namespaces:
+            return []
+        if self.mmr_lambda is None:
+            matches = self.search_with_scores(query_vector, self.k)
+        else:
+            candidates = self.search_with_vectors(query_vector, max(self.fetch_k, self.k))
+            if not candidates:
+                return []
+            relevance = normalize_scores(dict(enumerate(score for _, score, _ in candidates)))
+            picks = mmr_select(
+                [relevance[position] for position in range(len(candidates))],
+                [vector for _, _, vector in candidates],
+                self.k,
+                self.mmr_lambda
+            )
+            matches = [candidates[position][:2] for position in picks]
+
+        documents = []
+        for document, score in matches:
+            # Scores let the context builder drop weak candidates
+            document.metadata["score"] = score
+            documents.append(document)
+        return documents
+
+class HybridRetriever(NamespaceRetriever):
+    """Fuses BM25 keyword matches from the local sparse index with vector similarity.
+
+    Both searches over-fetch fetch_k candidates. BM25 scores are min-max
+    normalized per namespace before the best are pooled, since each document
+    has its own term statistics. Each score list is then min-max
+    normalized and blended with weight alpha on the vector side, so exact
+    matches on names, tickers and figures can outrank loosely similar chunks
+    without raising k. With mmr_lambda set, the fused candidates are reranked
+    for diversity using the stored vectors of the dense matches; keyword-only
+    matches have no vector at hand and are never penalized as redundant.
+    """
+
+    sparse_store: Any
+    index_name: str
+    alpha: float = 0.5
+
+    def retrieve_by_vector(self, query, query_vector):
+        if not self.namespaces:
+            return []
+
+        documents = {}
+        dense_scores = {}
+        vectors = {}
+        if self.mmr_lambda is None:
+            dense_matches = [
+                (document, score, None)
+                for document, score in self.search_with_scores(query_vector, self.fetch_k)
+            ]
+        else:
+            dense_matches = self.search_with_vectors(query_vector, self.fetch_k)
+        for document, score, vector in dense_matches:
+            chunk_id = make_chunk_id(document.metadata.get("doc_id", ""), document.page_content)
+            documents[chunk_id] = document
+            dense_scores[chunk_id] = score
+            vectors[chunk_id] = vector
+
+        sparse_matches = []
+        for namespace in self.namespaces:
+            matches = self.sparse_store.get(self.index_name, namespace).search(query, self.fetch_k)
+            # Each namespace has its own IDF and average length, so raw scores are not comparable across them
+            normalized = normalize_scores({chunk_id: score for chunk_id, _, _, score in matches})
+            sparse_matches.extend(
+                (chunk_id, text, metadata, normalized[chunk_id]) for chunk_id, text, metadata, _ in matches
+            )
+        sparse_matches = sorted(sparse_matches, key=lambda match: match[3], reverse=True)[:self.fetch_k]
+
+        sparse_scores = {}
+        for chunk_id, text, metadata, score in sparse_matches:
+            documents.setdefault(chunk_id, Document(page_content=text, metadata=dict(metadata)))
+            sparse_scores[chunk_id] = score
+
+        dense_scores = normalize_scores(dense_scores)
+        sparse_scores = normalize_scores(sparse_scores)
+        fused = {
+            chunk_id: self.alpha * dense_scores.get(chunk_id, 0.0)
+            + (1 - self.alpha) * sparse_scores.get(chunk_id, 0.0)
+            for chunk_id in documents
+        }
+        ranked = sorted(fused, key=fused.get, reverse=True)
+        if self.mmr_lambda is None:
+            ranked = ranked[:self.k]
+        else:
+            dimension = len(query_vector)
+            picks = mmr_select(
+                [fused[chunk_id] for chunk_id in ranked],
+                [vectors.get(chunk_id) or [0.0] * dimension for chunk_id in ranked],
+                self.k,
+                self.mmr_lambda
+            )
+            ranked = [ranked[position] for position in picks]
+        for chunk_id in ranked:
+            documents[chunk_id].metadata["score"] = fused[chunk_id]
+        return [documents[chunk_id] for chunk_id in ranked]
\ No newline at end of file
@@ -0,0 +1,145 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from file_utils import atomic_write_json
+
+# Keeps figures like "4.2" or "1,200" and tickers together as single terms
+_TERM_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+def tokenize(text):
+    """Lowercase keyword terms used by the sparse index"""
+    return _TERM_PATTERN.findall(text.lower())
+
+class BM25Index:
+    """In-memory inverted index over the chunks of one namespace, scored with BM25"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        # Row-oriented chunk storage; deleted rows are set to None
+        self.ids = []
+        self.texts = []
+        self.metadata = []
+        self.lengths = []
+        self.id_to_row = {}
+        self.postings = {}
+        self.total_length = 0
+        # Ingestion may add chunks while questions are being answered
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.id_to_row)
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self.id_to_row
+
+    def add(self, chunk_id, text, metadata):
+        """Index a chunk; chunks already present only have their metadata replaced"""
+        with self._lock:
+            if chunk_id in self.id_to_row:
+                # Same text, so the postings stand, but its location may have moved
+                self.metadata[self.id_to_row[chunk_id]] = metadata
+                return
+            row = len(self.ids)
+            terms = Counter(tokenize(text))
+            for term, frequency in terms.items():
+                self.postings.setdefault(term, {})[row] = frequency
+            length = sum(terms.values())
+            self.ids.append(chunk_id)
+            self.texts.append(text)
+            self.metadata.append(metadata)
+            self.lengths.append(length)
+            self.id_to_row[chunk_id] = row
+            self.total_length += length
+
+    def remove(self, chunk_ids):
+        """Drop chunks from the index"""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                row = self.id_to_row.pop(chunk_id, None)
+                if row is None:
+                    continue
+                for term in set(tokenize(self.texts[row])):
+                    rows = self.postings.get(term)
+                    if rows is not None:
+                        rows.pop(row, None)
+                        if not rows:
+                            del self.postings[term]
+                self.total_length -= self.lengths[row]
+                self.ids[row] = self.texts[row] = self.metadata[row] = None
+
+    def chunks(self):
+        """Return (chunk_id, text, metadata) for every chunk in the index"""
+        with self._lock:
+            return [
+                (chunk_id, text, metadata)
+                for chunk_id, text, metadata in zip(self.ids, self.texts, self.metadata)
+                if chunk_id is not None
+            ]
+
+    def search(self, query, k):
+        """Return (chunk_id, text, metadata, score) for the k best BM25 matches"""
+        with self._lock:
+            document_count = len(self.id_to_row)
+            if not document_count:
+                return []
+            average_length = self.total_length / document_count
+
+            scores = {}
+            for term in set(tokenize(query)):
+                rows = self.postings.get(term)
+                if not rows:
+                    continue
+                idf = math.log(1 + (document_count - len(rows) + 0.5) / (len(rows) + 0.5))
+                for row, frequency in rows.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[row] / average_length)
+                    scores[row] = scores.get(row, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self.ids[row], self.texts[row], self.metadata[row], score) for row, score in best]
+
+    def to_dict(self):
+        # Only the chunks are stored; postings are rebuilt on load to keep files compact
+        with self._lock:
+            return {"chunks": [list(chunk) for chunk in self.chunks()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        for chunk_id, text, metadata in data.get("chunks", []):
+            index.add(chunk_id, text, metadata)
+        return index
+
+class SparseIndexStore:
+    """Loads, caches and persists one BM25Index per index and namespace"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _path(self, index_name, namespace):
+        return os.path.join(self.directory, index_name, f"{namespace or '__default__'}.json")
+
+    def get(self, index_name, namespace):
+        """Return the BM25 index for a namespace, loading it from disk on first use"""
+        key = (index_name, namespace)
+        with self._lock:
+            if key not in self._indexes:
+                path = self._path(index_name, namespace)
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        self._indexes[key] = BM25Index.from_dict(json.load(f))
+                else:
+                    self._indexes[key] = BM25Index()
+            return self._indexes[key]
+
+    def save(self, index_name, namespace):
+        """Persist a namespace's BM25 index"""
+        index = self.get(index_name, namespace)
+        atomic_write_json(self._path(index_name, namespace), index.to_dict())
\ No newline at end of file
@@ -0,0 +1,181 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.prompts import PromptTemplate
+
+from tracing import Trace
+
+MAP_PROMPT = PromptTemplate(
+    template="""Summarize this excerpt of a report for a financial analyst.
+        Keep the companies, figures, periods and trends it mentions. {focus}
+        Reply with the summary only, in at most {max_words} words.
+
+        Text to summarize:
+        {text}
+
+        Summary: """,
+    input_variables=["focus", "text", "max_words"]
+)
+
+REDUCE_PROMPT = PromptTemplate(
+    template="""Combine these partial summaries of consecutive parts of a report into one summary.
+        Keep the most important figures, periods and trends, and drop repetition. {focus}
+        Reply with the summary only, in at most {max_words} words.
+
+        Text to summarize:
+        {text}
+
+        Summary: """,
+    input_variables=["focus", "text", "max_words"]
+)
+
+COMPARE_PROMPT = PromptTemplate(
+    template="""Compare the following reports for a financial analyst.
+        Point out shared themes, differences in figures and how trends changed between them. {focus}
+        Cite the report names.
+
+        Reports to compare:
+        {summaries}
+
+        Comparison: """,
+    input_variables=["summaries", "focus"]
+)
+
+class DocumentSummarizer:
+    """Map-reduce summaries and comparisons over every chunk of indexed documents.
+
+    Each chunk is summarized on its own (map), concurrently, then partial
+    summaries are combined in order, in groups that fit reduce_token_budget,
+    until one remains (reduce). Every model call is cached on disk by a hash
+    of its prompt. Prompts do not name the document, so summarizing a revised
+    report or comparing it with another only pays for chunks whose text has
+    not been summarized before.
+    """
+
+    def __init__(
+        self,
+        llm,
+        cache,
+        cache_namespace,
+        sparse_store,
+        context_builder,
+        max_workers=8,
+        reduce_token_budget=3000,
+        summary_words=200
+    ):
+        self.llm = llm
+        self.cache = cache
+        # Namespace keeps summaries from different models apart
+        self.cache_namespace = cache_namespace
+        # The local keyword index holds the text of every chunk of a document
+        self.sparse_store = sparse_store
+        self.context_builder = context_builder
+        self.max_workers = max_workers
+        self.reduce_token_budget = reduce_token_budget
+        self.summary_words = summary_words
+
+    def _key(self, prompt):
+        return hashlib.sha256(f"{self.cache_namespace}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def _invoke_all(self, prompts, stage, trace):
+        """Run prompts concurrently, serving the ones seen before from the cache"""
+        keys = [self._key(prompt) for prompt in prompts]
+        cached = {key: value.decode("utf-8") for key, value in self.cache.get_many(list(set(keys))).items()}
+        missing = {}
+        for key, prompt in zip(keys, prompts):
+            if key not in cached and key not in missing:
+                missing[key] = prompt
+        trace.increment(cached_calls=len(prompts) - len(missing), llm_calls=len(missing))
+
+        def invoke(prompt):
+            with trace.span(stage):
+                return self.llm.invoke(prompt).content.strip()
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = dict(zip(missing, executor.map(invoke, missing.values())))
+            self.cache.set_many({key: result.encode("utf-8") for key, result in results.items()})
+            cached.update(results)
+        return [cached[key] for key in keys]
+
+    def document_chunks(self, index_name, namespace):
+        """Return the text of every chunk of a document, in reading order"""
+        chunks = self.sparse_store.get(index_name, namespace).chunks()
+        # Re-ingested documents append changed chunks at the end, so sort by location
+        chunks.sort(key=lambda chunk: (
+            float(chunk[2].get("page_start", 0)),
+            float(chunk[2].get("start_index", 0))
+        ))
+        return [text for _, text, _ in chunks]
+
+    def _reduce(self, summaries, focus, trace):
+        while len(summaries) > 1:
+            groups = [[]]
+            group_tokens = 0
+            for summary in summaries:
+                tokens = self.context_builder.count_tokens(summary)
+                # Every group takes at least two summaries, so each round makes progress
+                if len(groups[-1]) >= 2 and group_tokens + tokens > self.reduce_token_budget:
+                    groups.append([])
+                    group_tokens = 0
+                groups[-1].append(summary)
+                group_tokens += tokens
+
+            combine = [index for index, group in enumerate(groups) if len(group) > 1]
+            combined = self._invoke_all(
+                [
+                    REDUCE_PROMPT.format(
+                        focus=focus,
+                        text="\n\n".join(groups[index]),
+                        max_words=self.summary_words
+                    )
+                    for index in combine
+                ],
+                "reduce",
+                trace
+            )
+            for index, summary in zip(combine, combined):
+                groups[index] = [summary]
+            summaries = [group[0] for group in groups]
+        return summaries[0]
+
+    def summarize(self, index_name, namespace, source, focus=None, trace=None):
+        """Summarize a whole indexed document; focus optionally narrows what to keep"""
+        trace = trace if trace is not None else Trace("summarize", index_name=index_name)
+        chunks = self.document_chunks(index_name, namespace)
+        if not chunks:
+            raise ValueError(f"No indexed text found for {source}. Process the document again.")
+        trace.increment(chunks=len(chunks))
+
+        focus = f"Focus on: {focus}." if focus else ""
+        summaries = self._invoke_all(
+            [
+                MAP_PROMPT.format(focus=focus, text=text, max_words=self.summary_words)
+                for text in chunks
+            ],
+            "map",
+            trace
+        )
+        return self._reduce(summaries, focus, trace)
+
+    def compare(self, index_name, documents, focus=None, trace=None):
+        """Compare documents given as (namespace, name) pairs.
+
+        Returns the comparison and the per-document summaries it was based on.
+        """
+        trace = trace if trace is not None else Trace("compare", index_name=index_name)
+        summaries = {
+            name: self.summarize(index_name, namespace, name, focus=focus, trace=trace)
+            for namespace, name in documents
+        }
+        comparison, = self._invoke_all(
+            [
+                COMPARE_PROMPT.format(
+                    summaries="\n\n".join(f"{name}: {summary}" for name, summary in summaries.items()),
+                    focus=f"Focus on: {focus}." if focus else ""
+                )
+            ],
+            "compare",
+            trace
+        )
+        return comparison, summaries
\ No newline at end of file
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+class Trace:
+    """Per-stage wall time, counts and token usage for one ingestion or answer.
+
+    Stage times accumulate, so a stage entered from several worker threads
+    (e.g. concurrent embedding batches) reports its total busy time, which
+    can exceed the wall time of the whole trace.
+    """
+
+    def __init__(self, kind, sink=None, **attributes):
+        self.kind = kind
+        self.sink = sink
+        self.attributes = attributes
+        self.stages = {}
+        self.counts = {}
+        self.started = time.time()
+        self.total_seconds = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, stage):
+        """Time a block of work and add it to a stage.
+
+        Time spent in spans nested on the same thread is excluded from the
+        enclosing stage, so each stage only reports its own work.
+        """
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.add_time(stage, elapsed - nested)
+
+    def timed(self, iterable, stage):
+        """Yield from an iterable, timing each step as a stage"""
+        iterator = iter(iterable)
+        while True:
+            with self.span(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, **counts):
+        """Set counts such as pages, chunks or tokens"""
+        with self._lock:
+            self.counts.update(counts)
+
+    def increment(self, **counts):
+        """Add to counts, e.g. from concurrent batches"""
+        with self._lock:
+            for name, value in counts.items():
+                self.counts[name] = self.counts.get(name, 0) + value
+
+    def set(self, **attributes):
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def finish(self):
+        """Stop the clock and export the trace once; returns it as a dict"""
+        with self._lock:
+            first_finish = self.total_seconds is None
+            if first_finish:
+                self.total_seconds = time.perf_counter() - self._start
+        record = self.to_dict()
+        if first_finish and self.sink is not None:
+            self.sink.write(record)
+        return record
+
+    def to_dict(self):
+        with self._lock:
+            total = self.total_seconds if self.total_seconds is not None else time.perf_counter() - self._start
+            return {
+                "kind": self.kind,
+                "started": self.started,
+                "total_seconds": round(total, 4),
+                "stages": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+                "counts": dict(self.counts),
+                **self.attributes,
+            }
+
+class MetricsSink:
+    """Appends finished traces to a local JSON Lines file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
\ No newline at end of file
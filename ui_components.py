@@ -1,5 +1,10 @@
+import html
+import time
+
 import streamlit as st
 
+from document_loaders import supported_extensions
+
 class UIComponents:
     """UI components and styling for the application"""
     
@@ -87,6 +92,17 @@ class UIComponents:
                 border-left: 4px solid #667eea;
             }
             
+            .analysis-details {
+                margin: -0.5rem 4rem 1rem 0;
+                padding: 0.6rem 1.2rem;
+                border: 1px solid rgba(49, 51, 63, 0.2);
+                border-radius: 10px;
+            }
+            
+            .analysis-details summary {
+                cursor: pointer;
+            }
+            
             .metric-card {
                 background: white;
                 padding: 1.2rem;
@@ -153,13 +169,13 @@ class UIComponents:
                 <h1 style="font-size: 4rem;">📄</h1>
                 <h2>Welcome to IntelliDoc Analyzer</h2>
                 <p style="font-size: 1.2rem; color: #666; margin-bottom: 2rem;">
-                    Upload a PDF document to unlock AI-powered analysis and intelligent conversations with your content.
+                    Upload a PDF, CSV, HTML or Word document to unlock AI-powered analysis and intelligent conversations with your content.
                 </p>
                 <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
                            color: white; padding: 2rem; border-radius: 15px;">
                     <h3>🚀 Get Started</h3>
                     <ol style="text-align: left; color: white;">
-                        <li>Upload a PDF using the sidebar</li>
+                        <li>Upload a document using the sidebar</li>
                         <li>Click "Process Document"</li>
                         <li>Start asking questions about your content</li>
                     </ol>
@@ -168,7 +184,71 @@ class UIComponents:
             """, unsafe_allow_html=True)
     
     @staticmethod
-    def render_sidebar(uploaded_file, processed, use_rag, index_name, process_callback):
+    def render_token_stream(tokens, refresh_interval=0.05):
+        """Render streamed tokens progressively and return the full text"""
+        placeholder = st.empty()
+        placeholder.markdown("🤖 Thinking...")
+        parts = []
+        last_render = 0.0
+        for token in tokens:
+            parts.append(token)
+            # Throttle redraws; each one is a round-trip to the browser
+            now = time.monotonic()
+            if now - last_render >= refresh_interval:
+                placeholder.markdown("".join(parts) + "▌")
+                last_render = now
+        
+        text = "".join(parts)
+        placeholder.markdown(text)
+        return text
+    
+    @staticmethod
+    def timings_html(timings):
+        """Per-stage timings and counts recorded for an answer, as HTML lines"""
+        lines = []
+        if timings.get("standalone_question"):
+            lines.append(f"<strong>Searched for:</strong> {html.escape(timings['standalone_question'])}")
+        time_line = f"<strong>Time:</strong> {timings['total_seconds']:.2f}s"
+        if "first_token_seconds" in timings:
+            time_line += f" (first token after {timings['first_token_seconds']:.2f}s)"
+        lines.append(time_line)
+        if timings["stages"]:
+            lines.append(" · ".join(f"{stage} {seconds:.3f}s" for stage, seconds in timings["stages"].items()))
+        if timings["counts"]:
+            lines.append(" · ".join(f"{name.replace('_', ' ')}: {value}" for name, value in timings["counts"].items()))
+        if timings.get("cache_hit"):
+            lines.append("⚡ Served from the answer cache")
+        return "".join(f"<p>{line}</p>" for line in lines)
+    
+    @staticmethod
+    def message_html(role, content, details):
+        """Render a chat message and its analysis details to HTML, once per message"""
+        if role == "user":
+            return f'<div class="chat-user"><strong>You:</strong><br>{content}</div>'
+        block = f'<div class="chat-assistant"><strong>Analyst:</strong><br>{content}</div>'
+        if "mode" not in details:
+            return block
+        
+        # A collapsed <details> block costs no extra Streamlit elements, unlike an expander
+        source = "General Knowledge" if details["mode"] == "LLM" else "Document Content"
+        parts = [
+            f"<p><strong>Mode:</strong> {html.escape(details['mode'])}</p>",
+            f"<p><strong>Source:</strong> {source}</p>",
+        ]
+        if details.get("sources"):
+            parts.append("<p><strong>Citations:</strong></p><ul>")
+            parts.extend(f"<li>{html.escape(citation)}</li>" for citation in details["sources"])
+            parts.append("</ul>")
+        if details.get("timings"):
+            parts.append(UIComponents.timings_html(details["timings"]))
+        # Kept on one line so markdown treats it as a single HTML block
+        return (
+            f'{block}\n\n<details class="analysis-details"><summary>🔍 Analysis Details</summary>'
+            f'{"".join(parts)}</details>'
+        )
+    
+    @staticmethod
+    def render_sidebar(processed, use_rag, index_name, process_callback):
         """Render the sidebar components"""
         st.markdown('<div class="sidebar-header"><h2>⚙️ Control Center</h2></div>', unsafe_allow_html=True)
         
@@ -176,15 +256,16 @@ class UIComponents:
         st.markdown("### 📁 Document Upload")
         st.markdown('<div class="upload-area">', unsafe_allow_html=True)
         uploaded_file = st.file_uploader(
-            "Drag & Drop PDF File",
-            type="pdf",
+            "Drag & Drop Document",
+            type=supported_extensions(),
             help="Upload your document for AI analysis",
-            label_visibility="collapsed"
+            label_visibility="collapsed",
+            key=f"uploader_{st.session_state.uploader_key}"
         )
         st.markdown("""
         <div style="text-align: center; color: #666; margin-top: 1rem;">
             <span style="font-size: 3rem;">📄</span><br>
-            <strong>Drop PDF Here</strong><br>
+            <strong>Drop PDF, CSV, HTML or DOCX Here</strong><br>
             <small>or click to browse</small>
         </div>
         """, unsafe_allow_html=True)
@@ -223,15 +304,86 @@ class UIComponents:
         col1, col2 = st.columns(2)
         with col1:
             if st.button("🔄 New Chat", use_container_width=True):
-                st.session_state.messages = []
+                st.session_state.messages.clear()
+                st.session_state.memory.clear()
                 st.rerun()
         with col2:
             if st.button("📤 New Doc", use_container_width=True):
                 st.session_state.vectorstore = None
                 st.session_state.llm = None
-                st.session_state.messages = []
+                st.session_state.messages.clear()
                 st.session_state.processed = False
-                st.session_state.uploaded_file = None
+                st.session_state.selected_docs = []
+                st.session_state.memory.clear()
                 st.rerun()
         
-        return uploaded_file, index_name
\ No newline at end of file
+        return index_name
+    
+    @staticmethod
+    def render_document_selector(documents, selected_doc_ids):
+        """Render the knowledge base document picker and return the selected document IDs"""
+        st.markdown("### 📚 Knowledge Base")
+        if not documents:
+            st.caption("No documents indexed yet")
+            return []
+        
+        labels = {
+            document["doc_id"]: f"{document['name']} ({document['pages']} pages)"
+            for document in documents
+        }
+        return st.multiselect(
+            "Documents to search",
+            options=list(labels),
+            default=[doc_id for doc_id in selected_doc_ids if doc_id in labels],
+            format_func=labels.get,
+            help="Questions are answered only from the selected documents"
+        )
+
+    
+    @staticmethod
+    def render_report_actions(document_count):
+        """Render whole-document summary and comparison actions; returns (action, focus)"""
+        focus = st.text_input(
+            "Focus (optional)",
+            placeholder="e.g. revenue trends by region",
+            help="Summaries and comparisons keep what matters for this focus"
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("📝 Summarize Selected", use_container_width=True, disabled=document_count < 1):
+                return "summarize", focus.strip()
+        with col2:
+            if st.button(
+                "⚖️ Compare Selected",
+                use_container_width=True,
+                disabled=document_count < 2,
+                help="Select at least two documents to compare"
+            ):
+                return "compare", focus.strip()
+        return None, focus.strip()
+    
+    @staticmethod
+    def render_ingestion_jobs(jobs):
+        """Render background ingestion jobs and their progress"""
+        if not jobs:
+            return
+        st.markdown("### ⏳ Processing Queue")
+        for job in jobs:
+            progress = job["progress"]
+            if job["state"] == "queued":
+                st.info(f"**{job['file_name']}** is waiting in the queue")
+            elif job["state"] == "running":
+                st.info(
+                    f"**{job['file_name']}**  \n"
+                    f"📄 {progress['pages']} pages read · 🔪 {progress['chunks']} chunks · "
+                    f"🧠 {progress['embedded']} embedded · 🚀 {progress['upserted']} uploaded · "
+                    f"💾 {progress.get('memory_mb', 0.0):.0f} MB held"
+                )
+            elif job["state"] == "done":
+                st.success(
+                    f"**{job['file_name']}** - {progress['pages']} pages, {progress['chunks']} chunks "
+                    f"indexed in {job['result'].get('seconds', 0.0):.1f}s · "
+                    f"peak memory held {job['result'].get('peak_memory_mb', 0.0):.0f} MB"
+                )
+            else:
+                st.error(f"**{job['file_name']}** failed: {job['error']}")
\ No newline at end of file